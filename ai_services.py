@@ -1,49 +1,38 @@
 import os
+import re
 import json
+import time
+import hashlib
+import asyncio
+import threading
 import httpx
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
+from utils import file_sha256
 
+try:
+    import h2  # noqa: F401 - only needed for HTTP/2, installed with httpx[http2]
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
 
-async def transcribe_audio(file_path: str) -> str:
-    """Transcribe audio file using OpenAI Whisper API"""
-    try:
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            return "Error: OPENAI_API_KEY not set"
-        
-        async with httpx.AsyncClient() as client:
-            with open(file_path, 'rb') as audio_file:
-                files = {
-                    'file': (Path(file_path).name, audio_file, 'audio/mpeg'),
-                    'model': (None, 'whisper-1')
-                }
-                headers = {'Authorization': f'Bearer {openai_api_key}'}
-                
-                response = await client.post(
-                    'https://api.openai.com/v1/audio/transcriptions',
-                    files=files,
-                    headers=headers
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result.get('text', '')
-                else:
-                    return f"Transcription failed: {response.status_code}"
-    
-    except Exception as e:
-        return f"Transcription error: {str(e)}"
+try:
+    import tiktoken  # optional: exact token counts for prompt budgeting
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
 
 
-async def extract_entities_from_text(text: str) -> dict:
-    """Extract maintenance-related entities from text using OpenAI"""
-    try:
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            return {"error": "OPENAI_API_KEY not set"}
-        
-        prompt = f"""
+OPENAI_TRANSCRIPTIONS_URL = 'https://api.openai.com/v1/audio/transcriptions'
+OPENAI_CHAT_URL = 'https://api.openai.com/v1/chat/completions'
+WHISPER_MODEL = 'whisper-1'
+ENTITY_MODEL = 'gpt-3.5-turbo'
+
+ENTITY_SYSTEM_PROMPT = 'You are a maintenance expert. Extract structured data from maintenance reports.'
+ENTITY_PROMPT_TEMPLATE = """
         Extract maintenance-related information from the following text and return a JSON object with these fields:
         - equipment_ids: array of equipment identifiers
         - part_numbers: array of part numbers
@@ -55,151 +44,1037 @@ async def extract_entities_from_text(text: str) -> dict:
         
         Return only valid JSON:
         """
+ENTITY_BATCH_PROMPT_TEMPLATE = """
+        Extract maintenance-related information from each of the numbered notes below. Each note starts
+        with a line "### NOTE <number>". For every note return a JSON object with these fields:
+        - index: the note's number
+        - equipment_ids: array of equipment identifiers
+        - part_numbers: array of part numbers
+        - defect_codes: array of defect/issue codes
+        - priority: one of "low", "medium", "high", "critical"
+        - description: brief summary of the issue
+
+        {notes}
+
+        Return only a valid JSON array with exactly one object per note, in note order:
+        """
+# Changes whenever the extraction prompt changes, invalidating cached extractions
+ENTITY_PROMPT_VERSION = hashlib.sha256(
+    (ENTITY_SYSTEM_PROMPT + ENTITY_PROMPT_TEMPLATE + ENTITY_BATCH_PROMPT_TEMPLATE).encode()
+).hexdigest()[:16]
+# Report prompts estimated above REPORT_MAP_REDUCE_TOKENS are built from summaries of
+# REPORT_CHUNK_TOKENS-sized chunks of the notes instead of the notes themselves
+REPORT_MAP_REDUCE_TOKENS = int(os.getenv("REPORT_MAP_REDUCE_TOKENS", "6000"))
+REPORT_CHUNK_TOKENS = int(os.getenv("REPORT_CHUNK_TOKENS", "2500"))
+REPORT_MAX_MAP_LEVELS = 3
+REPORT_MAP_ATTEMPTS = 2
+# Notes packed into one batched extraction call: token budget for the note text and a cap on the count
+ENTITY_BATCH_MAX_TOKENS = int(os.getenv("ENTITY_BATCH_MAX_TOKENS", "2000"))
+ENTITY_BATCH_MAX_ITEMS = int(os.getenv("ENTITY_BATCH_MAX_ITEMS", "10"))
+
+# Per-endpoint timeouts: Whisper uploads whole recordings, chat calls are small requests
+ENDPOINT_TIMEOUTS = {
+    "transcriptions": httpx.Timeout(float(os.getenv("AI_TRANSCRIPTION_TIMEOUT", "120")), connect=10.0),
+    "chat": httpx.Timeout(float(os.getenv("AI_CHAT_TIMEOUT", "60")), connect=10.0),
+}
+
+
+class AIClientManager:
+    """Process-wide pooled httpx.AsyncClient shared by every OpenAI call.
+
+    Created at app startup and closed at shutdown so keep-alive connections (and
+    their TLS sessions) are reused across requests. Requests take a slot from a
+    semaphore sized to the connection limit, which is what the in-use and wait
+    time metrics measure.
+    """
+
+    def __init__(self, max_connections: int = None, max_keepalive: int = None, http2: bool = None):
+        self.max_connections = max_connections or int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+        self.max_keepalive = max_keepalive or int(os.getenv("AI_MAX_KEEPALIVE", "10"))
+        if http2 is None:
+            http2 = os.getenv("AI_HTTP2", "1") == "1"
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._client = None
+        self._slots = None
+        self.requests = 0
+        self.errors = 0
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.waiting = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def start(self):
+        """Open the shared client (no-op if it is already open)"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive,
+                ),
+                timeout=ENDPOINT_TIMEOUTS["chat"],
+            )
+            self._slots = asyncio.Semaphore(self.max_connections)
+
+    async def close(self):
+        """Close the shared client and drop its pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._slots = None
+
+    @asynccontextmanager
+    async def _slot(self):
+        self.waiting += 1
+        started = time.perf_counter()
+        async with self._slots:
+            waited = time.perf_counter() - started
+            self.waiting -= 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+            try:
+                yield
+            finally:
+                self.in_use -= 1
+
+    async def post(self, endpoint: str, url: str, **kwargs) -> httpx.Response:
+        """POST through the shared pool using the timeout configured for the endpoint"""
+        # Lazily start for callers outside the app lifecycle (scripts, one-off jobs)
+        await self.start()
+        async with self._slot():
+            self.requests += 1
+            try:
+                return await self._client.post(url, timeout=ENDPOINT_TIMEOUTS[endpoint], **kwargs)
+            except httpx.HTTPError:
+                self.errors += 1
+                raise
+
+    @asynccontextmanager
+    async def stream(self, endpoint: str, url: str, **kwargs):
+        """POST through the shared pool, yielding the response while its body streams in"""
+        await self.start()
+        async with self._slot():
+            self.requests += 1
+            try:
+                async with self._client.stream("POST", url, timeout=ENDPOINT_TIMEOUTS[endpoint], **kwargs) as response:
+                    yield response
+            except httpx.HTTPError:
+                self.errors += 1
+                raise
+
+    def metrics(self) -> dict:
+        """Pool-level metrics: configuration, connections in use and slot wait times"""
+        return {
+            "open": self._client is not None,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive": self.max_keepalive,
+            "requests": self.requests,
+            "errors": self.errors,
+            "in_use": self.in_use,
+            "peak_in_use": self.peak_in_use,
+            "waiting": self.waiting,
+            "avg_wait_ms": round(1000 * self.total_wait / self.requests, 2) if self.requests else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait, 2),
+        }
+
+
+ai_client = AIClientManager()
+
+
+class DetectionPool:
+    """Bounded thread pool for blocking image detection and annotation work.
+
+    The Moondream client, Pillow decoding/drawing and the preview save are all
+    synchronous, so they run here instead of on the event loop. Jobs beyond the
+    worker count wait in the executor queue; the metrics report that backlog
+    and how long jobs sat in it. A job that raises or returns an {"error": ...}
+    dict counts as failed.
+    """
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or int(os.getenv("DETECTION_WORKERS", "2"))
+        self._executor = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.queued = 0
+        self.running = 0
+        self.peak_queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def _run(self, submitted_at: float, func, args):
+        started = time.perf_counter()
+        waited = started - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        try:
+            return func(*args)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.total_run += time.perf_counter() - started
+
+    async def run(self, func, *args):
+        """Run func(*args) on a pool thread and await its result"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="detect")
+            self.submitted += 1
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._executor, self._run, time.perf_counter(), func, args)
+        except Exception:
+            self.failed += 1
+            raise
+        # Detection functions report failures as {"error": ...} rather than raising
+        if isinstance(result, dict) and "error" in result:
+            self.failed += 1
+        else:
+            self.completed += 1
+        return result
+
+    def shutdown(self):
+        """Drop queued jobs and stop the worker threads once running ones finish"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def metrics(self) -> dict:
+        finished = self.completed + self.failed
+        return {
+            "workers": self.workers,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "queued": self.queued,
+            "running": self.running,
+            "peak_queued": self.peak_queued,
+            "avg_wait_ms": round(1000 * self.total_wait / finished, 2) if finished else 0.0,
+            "max_wait_ms": round(1000 * self.max_wait, 2),
+            "avg_run_ms": round(1000 * self.total_run / finished, 2) if finished else 0.0,
+        }
+
+
+detection_pool = DetectionPool()
+
+
+async def transcribe_audio(file_path: str, cache=None) -> str:
+    """Transcribe audio file using OpenAI Whisper API
+
+    When a TranscriptionCache is given it is consulted first, keyed by the SHA-256
+    of the audio bytes, so re-uploads of the same recording skip the API call.
+    """
+    try:
+        audio_hash = None
+        if cache is not None:
+            audio_hash = await asyncio.to_thread(file_sha256, file_path)
+            cached = await asyncio.to_thread(cache.get, audio_hash, WHISPER_MODEL)
+            if cached is not None:
+                return cached
         
-        async with httpx.AsyncClient() as client:
-            headers = {
-                'Authorization': f'Bearer {openai_api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            payload = {
-                'model': 'gpt-3.5-turbo',
-                'messages': [
-                    {'role': 'system', 'content': 'You are a maintenance expert. Extract structured data from maintenance reports.'},
-                    {'role': 'user', 'content': prompt}
-                ],
-                'temperature': 0.3
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            return "Error: OPENAI_API_KEY not set"
+        
+        with open(file_path, 'rb') as audio_file:
+            files = {
+                'file': (Path(file_path).name, audio_file, 'audio/mpeg'),
+                'model': (None, WHISPER_MODEL)
             }
+            headers = {'Authorization': f'Bearer {openai_api_key}'}
             
-            response = await client.post(
-                'https://api.openai.com/v1/chat/completions',
-                json=payload,
+            response = await ai_client.post(
+                "transcriptions",
+                OPENAI_TRANSCRIPTIONS_URL,
+                files=files,
                 headers=headers
             )
             
             if response.status_code == 200:
                 result = response.json()
-                content = result['choices'][0]['message']['content']
-                try:
-                    return json.loads(content)
-                except json.JSONDecodeError:
-                    return {"error": "Invalid JSON response", "raw_content": content}
+                transcription = result.get('text', '')
+                if cache is not None:
+                    await asyncio.to_thread(cache.put, audio_hash, WHISPER_MODEL, transcription)
+                return transcription
             else:
-                return {"error": f"API request failed: {response.status_code}"}
+                return f"Transcription failed: {response.status_code}"
     
     except Exception as e:
-        return {"error": f"Entity extraction error: {str(e)}"}
+        return f"Transcription error: {str(e)}"
+
 
+async def extract_entities_from_text(text: str, cache=None) -> dict:
+    """Extract maintenance-related entities from text using OpenAI
 
-async def generate_maintenance_report(items_data: list) -> dict:
-    """Generate a structured maintenance report from processed items"""
+    When an EntityCache is given, unchanged (normalized) text returns the stored
+    result without calling the API; only successful extractions are cached.
+    """
     try:
+        if cache is not None:
+            cached = await asyncio.to_thread(cache.get, text, ENTITY_MODEL)
+            if cached is not None:
+                return cached
+        
         openai_api_key = os.getenv("OPENAI_API_KEY")
         if not openai_api_key:
             return {"error": "OPENAI_API_KEY not set"}
         
-        # Combine all transcriptions and extracted data
-        combined_text = ""
-        all_entities = {
-            "equipment_ids": [],
-            "part_numbers": [],
-            "defect_codes": [],
-            "descriptions": []
-        }
-        
-        for item in items_data:
-            if item.get('transcription'):
-                combined_text += f"\n{item['transcription']}"
-            if item.get('extracted_data'):
-                try:
-                    entities = json.loads(item['extracted_data'])
-                    all_entities["equipment_ids"].extend(entities.get("equipment_ids", []))
-                    all_entities["part_numbers"].extend(entities.get("part_numbers", []))
-                    all_entities["defect_codes"].extend(entities.get("defect_codes", []))
-                    all_entities["descriptions"].append(entities.get("description", ""))
-                except json.JSONDecodeError:
-                    pass
-        
-        prompt = f"""
-        Create a comprehensive maintenance report based on the following information:
+        prompt = ENTITY_PROMPT_TEMPLATE.format(text=text)
         
-        Combined Text: {combined_text}
-        
-        Extracted Entities:
-        - Equipment IDs: {list(set(all_entities["equipment_ids"]))}
-        - Part Numbers: {list(set(all_entities["part_numbers"]))}
-        - Defect Codes: {list(set(all_entities["defect_codes"]))}
+        headers = {
+            'Authorization': f'Bearer {openai_api_key}',
+            'Content-Type': 'application/json'
+        }
         
-        Generate a JSON report with these fields:
-        - title: descriptive title
-        - description: detailed problem description
-        - equipment_id: primary equipment identifier
-        - part_numbers: array of relevant part numbers
-        - defect_codes: array of defect codes
-        - corrective_action: recommended actions
-        - parts_used: array of parts that should be used
-        - next_service_date: suggested next service date (ISO format)
-        - priority: "low", "medium", "high", or "critical"
+        payload = {
+            'model': ENTITY_MODEL,
+            'messages': [
+                {'role': 'system', 'content': ENTITY_SYSTEM_PROMPT},
+                {'role': 'user', 'content': prompt}
+            ],
+            'temperature': 0.3
+        }
         
-        Return only valid JSON:
-        """
+        response = await ai_client.post(
+            "chat",
+            OPENAI_CHAT_URL,
+            json=payload,
+            headers=headers
+        )
         
-        async with httpx.AsyncClient() as client:
-            headers = {
-                'Authorization': f'Bearer {openai_api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            payload = {
-                'model': 'gpt-3.5-turbo',
-                'messages': [
-                    {'role': 'system', 'content': 'You are a maintenance expert creating structured reports from field data.'},
-                    {'role': 'user', 'content': prompt}
-                ],
-                'temperature': 0.3
-            }
-            
-            response = await client.post(
-                'https://api.openai.com/v1/chat/completions',
-                json=payload,
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                content = result['choices'][0]['message']['content']
-                try:
-                    return json.loads(content)
-                except json.JSONDecodeError:
-                    return {"error": "Invalid JSON response", "raw_content": content}
+        if response.status_code == 200:
+            result = response.json()
+            content = result['choices'][0]['message']['content']
+            try:
+                entities = json.loads(content)
+                if cache is not None and isinstance(entities, dict) and "error" not in entities:
+                    await asyncio.to_thread(cache.put, text, ENTITY_MODEL, entities)
+                return entities
+            except json.JSONDecodeError:
+                return {"error": "Invalid JSON response", "raw_content": content}
+        else:
+            return {"error": f"API request failed: {response.status_code}"}
+    
+    except Exception as e:
+        return {"error": f"Entity extraction error: {str(e)}"}
+
+
+_token_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count for budgeting prompts: tiktoken when installed, else about four characters per token"""
+    global _token_encoding
+    if TIKTOKEN_AVAILABLE and _token_encoding is None:
+        try:
+            _token_encoding = tiktoken.encoding_for_model(ENTITY_MODEL)
+        except Exception:
+            _token_encoding = False  # encoding data unavailable (e.g. offline); use the heuristic
+    if _token_encoding:
+        return len(_token_encoding.encode(text or "", disallowed_special=()))
+    return (len(text or "") + 3) // 4
+
+
+def pack_by_tokens(costs: list, max_tokens: int, max_items: int = None) -> list:
+    """Group indexes into consecutive batches whose summed costs fit max_tokens.
+
+    An entry too large for the budget on its own gets a batch of one.
+    """
+    batches, current, used = [], [], 0
+    for index, cost in enumerate(costs):
+        if current and (used + cost > max_tokens or (max_items and len(current) >= max_items)):
+            batches.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def pack_entity_batches(texts: list, max_tokens: int = None, max_items: int = None) -> list:
+    """Group text indexes into extraction batches that fit the token budget, keeping input order"""
+    costs = [estimate_tokens(text) + 8 for text in texts]  # + delimiter line and numbering
+    return pack_by_tokens(costs, max_tokens or ENTITY_BATCH_MAX_TOKENS, max_items or ENTITY_BATCH_MAX_ITEMS)
+
+
+def parse_entity_batch(content: str, count: int):
+    """Parse a batched extraction reply into `count` entity dicts, or None if it doesn't line up"""
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.strip("`").removeprefix("json").strip()
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return None
+    if isinstance(data, dict):
+        data = data.get("results") or data.get("notes")
+    if not isinstance(data, list) or len(data) != count or not all(isinstance(d, dict) for d in data):
+        return None
+    by_index = {d.get("index"): d for d in data}
+    if set(by_index) == set(range(1, count + 1)):
+        data = [by_index[i] for i in range(1, count + 1)]
+    return [{k: v for k, v in d.items() if k != "index"} for d in data]
+
+
+async def _extract_entity_batch(texts: list) -> list:
+    """One chat completion for several texts; None when the reply can't be mapped back"""
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    notes = "\n\n".join(f"### NOTE {i}\n{text}" for i, text in enumerate(texts, 1))
+    payload = {
+        'model': ENTITY_MODEL,
+        'messages': [
+            {'role': 'system', 'content': ENTITY_SYSTEM_PROMPT},
+            {'role': 'user', 'content': ENTITY_BATCH_PROMPT_TEMPLATE.format(notes=notes)}
+        ],
+        'temperature': 0.3
+    }
+    try:
+        response = await ai_client.post(
+            "chat",
+            OPENAI_CHAT_URL,
+            json=payload,
+            headers={'Authorization': f'Bearer {openai_api_key}', 'Content-Type': 'application/json'}
+        )
+    except httpx.HTTPError:
+        return None
+    if response.status_code != 200:
+        return None
+    try:
+        content = response.json()['choices'][0]['message']['content']
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None
+    if not isinstance(content, str):
+        return None
+    return parse_entity_batch(content, len(texts))
+
+
+async def extract_entities_batch(texts: list, cache=None) -> list:
+    """Extract entities for many texts, packing short ones into shared requests.
+
+    Returns one result dict per text, in order, shaped like extract_entities_from_text
+    (including {"error": ...} entries). Cached texts are answered from the cache;
+    a batch whose reply is not a JSON array matching its notes falls back to one
+    extract_entities_from_text call per text.
+    """
+    results = [None] * len(texts)
+    pending = {}  # distinct uncached text -> positions in texts
+    for position, text in enumerate(texts):
+        cached = await asyncio.to_thread(cache.get, text, ENTITY_MODEL) if cache is not None and text not in pending else None
+        if cached is not None:
+            results[position] = cached
+        else:
+            pending.setdefault(text, []).append(position)
+
+    if pending and not os.getenv("OPENAI_API_KEY"):
+        for positions in pending.values():
+            for position in positions:
+                results[position] = {"error": "OPENAI_API_KEY not set"}
+        return results
+
+    unique = list(pending)
+
+    async def run(batch):
+        batch_texts = [unique[i] for i in batch]
+        extracted = await _extract_entity_batch(batch_texts) if len(batch) > 1 else None
+        if extracted is None:
+            extracted = await asyncio.gather(*(extract_entities_from_text(text) for text in batch_texts))
+        for text, entities in zip(batch_texts, extracted):
+            if cache is not None and "error" not in entities:
+                await asyncio.to_thread(cache.put, text, ENTITY_MODEL, entities)
+            for position in pending[text]:
+                results[position] = entities
+
+    await asyncio.gather(*(run(batch) for batch in pack_entity_batches(unique)))
+    return results
+
+
+REPORT_STRING_FIELDS = ["title", "description", "equipment_id", "corrective_action", "next_service_date", "priority"]
+REPORT_LIST_FIELDS = ["part_numbers", "defect_codes", "parts_used"]
+# A string field whose value may still be cut off mid-stream, and a list field once its array has closed
+_PARTIAL_STRING_FIELD = re.compile(r'"(%s)"\s*:\s*"((?:[^"\\]|\\.)*)' % "|".join(REPORT_STRING_FIELDS))
+_COMPLETE_LIST_FIELD = re.compile(r'"(%s)"\s*:\s*(\[[^\]]*\])' % "|".join(REPORT_LIST_FIELDS))
+
+
+REPORT_SYSTEM_PROMPT = 'You are a maintenance expert creating structured reports from field data.'
+REPORT_FIELDS_PROMPT = """
+    Generate a JSON report with these fields:
+    - title: descriptive title
+    - description: detailed problem description
+    - equipment_id: primary equipment identifier
+    - part_numbers: array of relevant part numbers
+    - defect_codes: array of defect codes
+    - corrective_action: recommended actions
+    - parts_used: array of parts that should be used
+    - next_service_date: suggested next service date (ISO format)
+    - priority: "low", "medium", "high", or "critical"
+    
+    Return only valid JSON:
+    """
+REPORT_PROMPT_TEMPLATE = """
+    Create a comprehensive maintenance report based on the following information:
+    
+    Combined Text: {combined_text}
+    
+    Extracted Entities:
+    - Equipment IDs: {equipment_ids}
+    - Part Numbers: {part_numbers}
+    - Defect Codes: {defect_codes}
+    """ + REPORT_FIELDS_PROMPT
+REPORT_UPDATE_PROMPT_TEMPLATE = """
+    Update an existing maintenance report with new field notes.
+    
+    Existing report (already covers every earlier note): {previous_report}
+    
+    New or revised notes (a revised note replaces what it said before): {combined_text}
+    
+    Extracted Entities from these notes:
+    - Equipment IDs: {equipment_ids}
+    - Part Numbers: {part_numbers}
+    - Defect Codes: {defect_codes}
+    
+    Keep everything from the existing report that the notes don't change and merge in the new information.
+    """ + REPORT_FIELDS_PROMPT
+# Stored workspace summaries written under another prompt are not reused
+REPORT_PROMPT_VERSION = hashlib.sha256(
+    (REPORT_SYSTEM_PROMPT + REPORT_PROMPT_TEMPLATE + REPORT_UPDATE_PROMPT_TEMPLATE).encode()
+).hexdigest()[:16]
+
+
+def _note_label(item: dict) -> str:
+    return f"{item.get('filename', 'note')}{' (revised)' if item.get('revised') else ''}"
+
+
+def _report_request(items_data: list, openai_api_key: str, stream: bool = False, previous_report: dict = None) -> dict:
+    """Build the chat completion request (headers and payload) for a maintenance report
+
+    With previous_report, items_data holds only the new or revised notes and the
+    model is asked to update that report instead of writing one from scratch.
+    """
+    # Combine all transcriptions and extracted data
+    combined_text = ""
+    all_entities = {
+        "equipment_ids": [],
+        "part_numbers": [],
+        "defect_codes": [],
+        "descriptions": []
+    }
+    
+    for item in items_data:
+        if item.get('transcription'):
+            if previous_report is not None:
+                combined_text += f"\n[{_note_label(item)}] {item['transcription']}"
             else:
-                return {"error": f"API request failed: {response.status_code}"}
+                combined_text += f"\n{item['transcription']}"
+        if item.get('extracted_data'):
+            try:
+                entities = json.loads(item['extracted_data'])
+                all_entities["equipment_ids"].extend(entities.get("equipment_ids", []))
+                all_entities["part_numbers"].extend(entities.get("part_numbers", []))
+                all_entities["defect_codes"].extend(entities.get("defect_codes", []))
+                all_entities["descriptions"].append(entities.get("description", ""))
+            except json.JSONDecodeError:
+                pass
+    
+    fields = dict(
+        combined_text=combined_text,
+        equipment_ids=list(set(all_entities["equipment_ids"])),
+        part_numbers=list(set(all_entities["part_numbers"])),
+        defect_codes=list(set(all_entities["defect_codes"])),
+    )
+    if previous_report is not None:
+        prompt = REPORT_UPDATE_PROMPT_TEMPLATE.format(previous_report=json.dumps(previous_report), **fields)
+    else:
+        prompt = REPORT_PROMPT_TEMPLATE.format(**fields)
+    
+    headers = {
+        'Authorization': f'Bearer {openai_api_key}',
+        'Content-Type': 'application/json'
+    }
+    
+    payload = {
+        'model': 'gpt-3.5-turbo',
+        'messages': [
+            {'role': 'system', 'content': REPORT_SYSTEM_PROMPT},
+            {'role': 'user', 'content': prompt}
+        ],
+        'temperature': 0.3
+    }
+    if stream:
+        payload['stream'] = True
+    return {"headers": headers, "json": payload}
+
+
+CHUNK_SUMMARY_PROMPT_TEMPLATE = """
+    Condense these maintenance field notes for a report that will be written from several such summaries.
+    Keep every equipment identifier, part number, defect code, measurement, observed problem and action taken.
+    
+    Notes: {combined_text}
+    
+    Return only valid JSON with these fields:
+    - summary: the condensed notes
+    - equipment_ids: array of equipment identifiers
+    - part_numbers: array of part numbers
+    - defect_codes: array of defect/issue codes
+    """
+
+
+class ReportMetrics:
+    """Latency and prompt-token counters for report generation, split by mode"""
+
+    def __init__(self):
+        self.reports = {"direct": 0, "map_reduce": 0}
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.map_calls = 0
+        self.map_failures = 0
+        self.map_prompt_tokens = 0
+        self.total_seconds = 0.0
+        self.map_seconds = 0.0
+        self.max_seconds = 0.0
+        self.last = {}
+
+    def record(self, mode: str, prompt_tokens: int, seconds: float, map_stats: dict, error: bool = False):
+        self.reports[mode] += 1
+        self.errors += int(error)
+        self.prompt_tokens += prompt_tokens
+        self.map_calls += map_stats["calls"]
+        self.map_failures += map_stats["failures"]
+        self.map_prompt_tokens += map_stats["prompt_tokens"]
+        self.total_seconds += seconds
+        self.map_seconds += map_stats["seconds"]
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.last = {
+            "mode": mode,
+            "error": error,
+            "prompt_tokens": prompt_tokens,
+            "map_calls": map_stats["calls"],
+            "map_failures": map_stats["failures"],
+            "map_levels": map_stats["levels"],
+            "map_prompt_tokens": map_stats["prompt_tokens"],
+            "map_ms": round(1000 * map_stats["seconds"], 1),
+            "total_ms": round(1000 * seconds, 1),
+        }
+
+    def metrics(self) -> dict:
+        total = sum(self.reports.values())
+        return {
+            "reports": total,
+            **{f"{mode}_reports": count for mode, count in self.reports.items()},
+            "errors": self.errors,
+            "tokenizer": "tiktoken" if _token_encoding else "chars/4",
+            "map_reduce_threshold_tokens": REPORT_MAP_REDUCE_TOKENS,
+            "chunk_tokens": REPORT_CHUNK_TOKENS,
+            "avg_prompt_tokens": round(self.prompt_tokens / total) if total else 0,
+            "map_calls": self.map_calls,
+            "map_failures": self.map_failures,
+            "map_prompt_tokens": self.map_prompt_tokens,
+            "avg_ms": round(1000 * self.total_seconds / total, 1) if total else 0.0,
+            "avg_map_ms": round(1000 * self.map_seconds / self.reports["map_reduce"], 1) if self.reports["map_reduce"] else 0.0,
+            "max_ms": round(1000 * self.max_seconds, 1),
+            "last": self.last,
+        }
+
+
+report_metrics = ReportMetrics()
+
+
+def report_prompt_tokens(items_data: list, previous_report: dict = None) -> int:
+    """Estimated tokens of the report prompt these items would produce"""
+    request = _report_request(items_data, "", previous_report=previous_report)
+    return sum(estimate_tokens(message["content"]) for message in request["json"]["messages"])
+
+
+def _item_tokens(item: dict) -> int:
+    return estimate_tokens(item.get("transcription")) + estimate_tokens(item.get("extracted_data"))
+
+
+def chunk_report_items(items_data: list, max_tokens: int = None) -> list:
+    """Split items into chunks of about max_tokens, cutting oversized transcriptions into parts"""
+    max_tokens = max_tokens or REPORT_CHUNK_TOKENS
+    pieces = []
+    for item in items_data:
+        tokens = _item_tokens(item)
+        words = (item.get("transcription") or "").split()
+        if tokens <= max_tokens or not words:
+            pieces.append(item)  # Nothing to split when the cost is all extracted data
+            continue
+        parts = -(-tokens // max_tokens)
+        size = max(1, -(-len(words) // parts))
+        for start in range(0, len(words), size):
+            pieces.append({
+                **item,
+                "transcription": " ".join(words[start:start + size]),
+                "extracted_data": item.get("extracted_data") if start == 0 else "",
+            })
+    return [[pieces[i] for i in batch] for batch in pack_by_tokens([_item_tokens(p) for p in pieces], max_tokens)]
+
+
+async def summarize_report_chunk(items: list, openai_api_key: str) -> dict:
+    """Map step: condense a chunk of notes into one summary item (same shape as items_data entries).
+
+    Raises RuntimeError when the request fails or the reply isn't a JSON object.
+    """
+    combined_text = "".join(
+        f"\n[{_note_label(item)}] {item['transcription']}" for item in items if item.get("transcription")
+    )
+    entities = {"equipment_ids": [], "part_numbers": [], "defect_codes": []}
+    for item in items:
+        try:
+            extracted = json.loads(item.get("extracted_data") or "{}")
+        except json.JSONDecodeError:
+            continue
+        for field in entities:
+            entities[field].extend(extracted.get(field, []) if isinstance(extracted, dict) else [])
+
+    response = await ai_client.post(
+        "chat",
+        OPENAI_CHAT_URL,
+        json={
+            'model': 'gpt-3.5-turbo',
+            'messages': [
+                {'role': 'system', 'content': REPORT_SYSTEM_PROMPT},
+                {'role': 'user', 'content': CHUNK_SUMMARY_PROMPT_TEMPLATE.format(combined_text=combined_text)}
+            ],
+            'temperature': 0.3
+        },
+        headers={'Authorization': f'Bearer {openai_api_key}', 'Content-Type': 'application/json'}
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Chunk summary request failed: {response.status_code}")
+    try:
+        summary = json.loads(response.json()['choices'][0]['message']['content'])
+    except (ValueError, KeyError, IndexError, TypeError):
+        raise RuntimeError("Invalid chunk summary reply")
+    if not isinstance(summary, dict):
+        raise RuntimeError("Chunk summary is not a JSON object")
+    # Keep the entities already extracted per item even if the summary dropped some
+    for field in entities:
+        entities[field] = list(dict.fromkeys(entities[field] + list(summary.get(field) or [])))
+    entities["description"] = summary.get("summary", "")
+    return {
+        "filename": f"summary of {len(items)} notes",
+        "type": "summary",
+        "transcription": str(summary.get("summary") or ""),
+        "extracted_data": json.dumps(entities),
+        "revised": all(item.get("revised") for item in items),
+    }
+
+
+async def _summarize_or_keep(chunk: list, openai_api_key: str, stats: dict) -> list:
+    """Summarize a chunk, retrying failed calls; keeps the chunk's own items if every attempt fails"""
+    for attempt in range(REPORT_MAP_ATTEMPTS):
+        stats["calls"] += 1
+        try:
+            return [await summarize_report_chunk(chunk, openai_api_key)]
+        except Exception as e:
+            error = e
+    stats["failures"] += 1
+    print(f"Chunk summary failed after {REPORT_MAP_ATTEMPTS} attempts, keeping {len(chunk)} notes: {error}")
+    return chunk
+
+
+def _new_map_stats() -> dict:
+    return {"calls": 0, "failures": 0, "levels": 0, "prompt_tokens": 0, "seconds": 0.0}
+
+
+async def condense_report_items(items_data: list, openai_api_key: str, previous_report: dict = None):
+    """Map phase of map-reduce report generation.
+
+    While the report prompt is estimated above REPORT_MAP_REDUCE_TOKENS, the items
+    are chunked and the chunks summarized concurrently; the summaries replace the
+    items (recursively, up to REPORT_MAX_MAP_LEVELS). Revised and new notes are
+    chunked apart so summaries keep the "(revised)" label for incremental updates.
+    A chunk whose summary keeps failing is passed on as its own items.
+    Returns (items, map stats).
+    """
+    stats = _new_map_stats()
+    started = time.perf_counter()
+    while stats["levels"] < REPORT_MAX_MAP_LEVELS and report_prompt_tokens(items_data, previous_report) > REPORT_MAP_REDUCE_TOKENS:
+        chunks = [
+            chunk
+            for revised in (False, True)
+            for chunk in chunk_report_items([item for item in items_data if bool(item.get("revised")) == revised])
+        ]
+        if len(chunks) <= 1 and stats["levels"]:
+            break  # Summaries no longer shrink into fewer chunks
+        stats["prompt_tokens"] += sum(_item_tokens(item) for chunk in chunks for item in chunk)
+        summarized = await asyncio.gather(*(_summarize_or_keep(chunk, openai_api_key, stats) for chunk in chunks))
+        items_data = [item for items in summarized for item in items]
+        stats["levels"] += 1
+    stats["seconds"] = time.perf_counter() - started
+    return items_data, stats
+
+
+async def generate_maintenance_report(items_data: list, previous_report: dict = None) -> dict:
+    """Generate a structured maintenance report from processed items (or update previous_report with them)
+
+    Large inputs are summarized chunk by chunk first (see condense_report_items).
+    """
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key:
+        return {"error": "OPENAI_API_KEY not set"}
+
+    started = time.perf_counter()
+    map_stats = _new_map_stats()
+    prompt_tokens = 0
+    report = None
+    try:
+        items_data, map_stats = await condense_report_items(items_data, openai_api_key, previous_report)
+        prompt_tokens = report_prompt_tokens(items_data, previous_report)
+        response = await ai_client.post(
+            "chat",
+            OPENAI_CHAT_URL,
+            **_report_request(items_data, openai_api_key, previous_report=previous_report)
+        )
+        
+        if response.status_code == 200:
+            result = response.json()
+            content = result['choices'][0]['message']['content']
+            try:
+                report = json.loads(content)
+            except json.JSONDecodeError:
+                report = {"error": "Invalid JSON response", "raw_content": content}
+        else:
+            report = {"error": f"API request failed: {response.status_code}"}
     
     except Exception as e:
-        return {"error": f"Report generation error: {str(e)}"}
+        report = {"error": f"Report generation error: {str(e)}"}
+
+    report_metrics.record(
+        "map_reduce" if map_stats["calls"] else "direct", prompt_tokens,
+        time.perf_counter() - started, map_stats, error="error" in report,
+    )
+    return report
+
+
+def parse_partial_report(buffer: str) -> dict:
+    """Pull the report fields readable so far out of an incomplete JSON response.
+
+    String fields are returned as soon as they open (possibly truncated); list
+    fields once their array is closed.
+    """
+    fields = {}
+    for name, raw in _PARTIAL_STRING_FIELD.findall(buffer):
+        # Drop a dangling escape backslash cut off at the end of the buffer
+        if (len(raw) - len(raw.rstrip("\\"))) % 2:
+            raw = raw[:-1]
+        try:
+            fields[name] = json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            fields[name] = raw
+    for name, raw in _COMPLETE_LIST_FIELD.findall(buffer):
+        try:
+            fields[name] = json.loads(raw)
+        except json.JSONDecodeError:
+            pass
+    return fields
+
+
+async def stream_maintenance_report(items_data: list, previous_report: dict = None):
+    """Stream a maintenance report with the chat completions stream option.
+
+    Yields {"fields": {...}} with the partially parsed report after every token,
+    then one final {"report": {...}} or {"error": ...}. Large inputs are
+    summarized first (see condense_report_items); only the reduce call streams.
+    """
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not openai_api_key:
+        yield {"error": "OPENAI_API_KEY not set"}
+        return
+
+    started = time.perf_counter()
+    map_stats = _new_map_stats()
+    prompt_tokens = 0
+    content = ""
+    final = None
+    try:
+        items_data, map_stats = await condense_report_items(items_data, openai_api_key, previous_report)
+        prompt_tokens = report_prompt_tokens(items_data, previous_report)
+        async with ai_client.stream(
+            "chat",
+            OPENAI_CHAT_URL,
+            **_report_request(items_data, openai_api_key, stream=True, previous_report=previous_report)
+        ) as response:
+            if response.status_code != 200:
+                final = {"error": f"API request failed: {response.status_code}"}
+            else:
+                async for line in response.aiter_lines():
+                    if not line.startswith("data: "):
+                        continue
+                    data = line[len("data: "):].strip()
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        content += delta
+                        yield {"fields": parse_partial_report(content)}
+    except Exception as e:
+        final = {"error": f"Report generation error: {str(e)}"}
+
+    if final is None:
+        try:
+            final = {"report": json.loads(content)}
+        except json.JSONDecodeError:
+            final = {"error": "Invalid JSON response", "raw_content": content}
+    report_metrics.record(
+        "map_reduce" if map_stats["calls"] else "direct", prompt_tokens,
+        time.perf_counter() - started, map_stats, error="error" in final,
+    )
+    yield final
+
+
+class ImageDetector:
+    """Long-lived Moondream detection service, created once and started with the app.
+
+    Holds the Moondream client and the label font so detections skip that setup,
+    and keeps the last few images in the encoded form Moondream uploads (keyed by
+    path, mtime and size), so detecting several entity types on one image only
+    decodes and re-encodes it once.
+    """
+
+    FONT_CANDIDATES = (
+        "arial.ttf",
+        "/System/Library/Fonts/Arial.ttf",  # macOS
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",  # Linux
+    )
+
+    def __init__(self, api_key: str = None, font_size: int = 12, max_encoded: int = None):
+        self.api_key = api_key
+        self.font_size = font_size
+        self.max_encoded = max_encoded or int(os.getenv("DETECTOR_ENCODED_CACHE", "8"))
+        self.model = None
+        self.font = None
+        self.error = None
+        self._encoded = OrderedDict()
+        self._lock = threading.Lock()
+        self.detections = 0
+        self.encode_hits = 0
+        self.encode_misses = 0
+
+    def start(self):
+        """Create the Moondream client and load the label font (no-op once started)"""
+        if self.font is None:
+            self.font = self._load_font()
+        if self.model is not None:
+            return
+        api_key = self.api_key or os.getenv("MOONDREAM_API_KEY")
+        if not api_key:
+            self.error = "MOONDREAM_API_KEY not set"
+            return
+        try:
+            import moondream as md
+        except ImportError:
+            self.error = "Moondream library not installed. Please install with: pip install moondream"
+            return
+        self.model = md.vl(api_key=api_key)
+        self.error = None
+
+    def _load_font(self):
+        for path in self.FONT_CANDIDATES:
+            try:
+                return ImageFont.truetype(path, self.font_size)
+            except IOError:
+                continue
+        return ImageFont.load_default()
+
+    def encode(self, image_path: str):
+        """Return (width, height, encoded image) for a file, reusing recent encodings"""
+        stat = os.stat(image_path)
+        key = (str(image_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if key in self._encoded:
+                self._encoded.move_to_end(key)
+                self.encode_hits += 1
+                return self._encoded[key]
+            self.encode_misses += 1
+        with Image.open(image_path) as image:
+            entry = (image.width, image.height, self.model.encode_image(image))
+        with self._lock:
+            self._encoded[key] = entry
+            while len(self._encoded) > self.max_encoded:
+                self._encoded.popitem(last=False)
+        return entry
+
+    def detect(self, image, entity_type: str) -> dict:
+        """Run Moondream detection on an image path or PIL image.
+
+        Returns {"objects": [...], "request_id": ..., "width": ..., "height": ...}.
+        """
+        self.start()
+        if self.model is None:
+            raise RuntimeError(self.error)
+        if isinstance(image, Image.Image):
+            width, height, encoded = image.width, image.height, self.model.encode_image(image)
+        else:
+            width, height, encoded = self.encode(image)
+        result = self.model.detect(encoded, entity_type)
+        self.detections += 1
+        return {
+            "objects": result["objects"],
+            "request_id": result.get("request_id", "unknown"),
+            "width": width,
+            "height": height,
+        }
+
+    def annotate(self, image: Image.Image, detections: list, entity_type: str) -> Image.Image:
+        """Return a copy of the image with a labelled box drawn for each detection"""
+        self.start()
+        preview_image = image.copy()
+        draw = ImageDraw.Draw(preview_image)
+        for detection in detections:
+            coords = detection["pixel_coords"]
+            draw.rectangle([coords["x_min"], coords["y_min"], coords["x_max"], coords["y_max"]], outline="red", width=2)
+            label = f"{entity_type.title()} {detection['index']}"
+            draw.text((coords["x_min"], coords["y_min"] - 15), label, fill="white", font=self.font)
+        return preview_image
+
+    def metrics(self) -> dict:
+        return {
+            "ready": self.model is not None,
+            "error": self.error,
+            "detections": self.detections,
+            "encoded_cached": len(self._encoded),
+            "encode_hits": self.encode_hits,
+            "encode_misses": self.encode_misses,
+        }
+
+
+image_detector = ImageDetector()
 
 
 async def detect_entities_in_image(image_path: str, entity_type: str) -> dict:
-    """Detect entities in image using Moondream API and create preview with bounding boxes"""
+    """Detect entities in image using Moondream API and create preview with bounding boxes
+
+    The blocking Moondream call and image rendering run on detection_pool.
+    """
+    return await detection_pool.run(_detect_entities_in_image, image_path, entity_type)
+
+
+def _detect_entities_in_image(image_path: str, entity_type: str) -> dict:
     try:
-        # Import moondream here to avoid dependency issues if not installed
-        import moondream as md
-        
-        # Get API key from environment
-        moondream_api_key = os.getenv("MOONDREAM_API_KEY")
-        if not moondream_api_key:
-            return {"error": "MOONDREAM_API_KEY not set"}
-        
-        # Initialize model with API key
-        model = md.vl(api_key=moondream_api_key)
-        
-        # Load the original image
-        original_image = Image.open(image_path)
-        
+        image_detector.start()
+        if image_detector.model is None:
+            return {"error": image_detector.error}
+
         # Detect entities
-        result = model.detect(original_image, entity_type)
+        result = image_detector.detect(image_path, entity_type)
         detections = result["objects"]
-        request_id = result.get("request_id", "unknown")
+        request_id = result["request_id"]
         
         if not detections:
             return {
@@ -210,40 +1085,10 @@ async def detect_entities_in_image(image_path: str, entity_type: str) -> dict:
                 "message": f"No {entity_type} entities found in the image"
             }
         
-        # Create a copy for preview (don't modify original)
-        preview_image = original_image.copy()
-        draw = ImageDraw.Draw(preview_image)
-        
-        # Try to load a font, fall back to default if not available
-        try:
-            font = ImageFont.truetype("arial.ttf", 12)
-        except IOError:
-            try:
-                # Try common system fonts
-                font = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", 12)  # macOS
-            except IOError:
-                try:
-                    font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 12)  # Linux
-                except IOError:
-                    font = ImageFont.load_default()
-        
-        # Process each detection
+        # Convert normalized coordinates to pixel values
+        width, height = result["width"], result["height"]
         detection_data = []
         for i, obj in enumerate(detections):
-            # Convert normalized coordinates to pixel values
-            x_min = int(obj["x_min"] * original_image.width)
-            y_min = int(obj["y_min"] * original_image.height)
-            x_max = int(obj["x_max"] * original_image.width)
-            y_max = int(obj["y_max"] * original_image.height)
-            
-            # Draw the bounding box rectangle
-            draw.rectangle([x_min, y_min, x_max, y_max], outline="red", width=2)
-            
-            # Draw the label text
-            label = f"{entity_type.title()} {i+1}"
-            draw.text((x_min, y_min - 15), label, fill="white", font=font)
-            
-            # Store detection data
             detection_data.append({
                 "index": i + 1,
                 "x_min": obj["x_min"],
@@ -251,10 +1096,10 @@ async def detect_entities_in_image(image_path: str, entity_type: str) -> dict:
                 "x_max": obj["x_max"],
                 "y_max": obj["y_max"],
                 "pixel_coords": {
-                    "x_min": x_min,
-                    "y_min": y_min,
-                    "x_max": x_max,
-                    "y_max": y_max
+                    "x_min": int(obj["x_min"] * width),
+                    "y_min": int(obj["y_min"] * height),
+                    "x_max": int(obj["x_max"] * width),
+                    "y_max": int(obj["y_max"] * height)
                 }
             })
         
@@ -263,7 +1108,8 @@ async def detect_entities_in_image(image_path: str, entity_type: str) -> dict:
         preview_path = image_path_obj.parent / f"{image_path_obj.stem}_preview{image_path_obj.suffix}"
         
         # Save the preview image (don't modify original)
-        preview_image.save(preview_path)
+        with Image.open(image_path) as original_image:
+            image_detector.annotate(original_image, detection_data, entity_type).save(preview_path)
         
         return {
             "success": True,
@@ -276,7 +1122,5 @@ async def detect_entities_in_image(image_path: str, entity_type: str) -> dict:
             "message": f"Found {len(detections)} {entity_type} entities"
         }
         
-    except ImportError:
-        return {"error": "Moondream library not installed. Please install with: pip install moondream"}
     except Exception as e:
-        return {"error": f"Entity detection error: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Entity detection error: {str(e)}"}
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import secrets
+import threading
+from collections import OrderedDict
+import itsdangerous
+from itsdangerous.exc import BadSignature
+from starlette.datastructures import MutableHeaders
+from starlette.middleware.sessions import Session
+from starlette.requests import HTTPConnection
+
+# Defaults for SESSION_BACKEND / CACHE_BACKEND, shared by main.py and launch.py
+DEFAULT_SESSION_BACKEND = "cookie"
+DEFAULT_CACHE_BACKEND = "sqlite"
+
+
+# Key/value backends shared by sessions and caches. Values are strings; callers serialize.
+class MemoryBackend:
+    """Per-process LRU dict store; only correct when the app runs as a single worker"""
+
+    shared = False
+
+    def __init__(self, max_entries: int = None):
+        self.max_entries = max_entries or int(os.getenv("MEMORY_BACKEND_MAX_ENTRIES", "10000"))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            value, expires_at = self._data.get(key, (None, None))
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int = None):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl if ttl else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class SQLiteBackend:
+    """Store in a kv_store table of the app database, shared by every worker on the host.
+
+    Lookups go through `reader` (a callable returning a read-only connection) when
+    given, so they never wait on the writer. Expired rows are skipped on read and
+    deleted by purge_expired, which also runs every purge_every writes.
+    """
+
+    shared = True
+
+    def __init__(self, db, table: str = "kv_store", reader=None, purge_every: int = None):
+        self.db = db
+        self.table = table
+        self.reader = reader or (lambda: db)
+        self.purge_every = purge_every or int(os.getenv("KV_PURGE_EVERY", "1000"))
+        self._writes = 0
+        db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)")
+        db.t[table].create_index(["expires_at"], if_not_exists=True)
+
+    def get(self, key: str):
+        rows = self.reader().q(
+            f"SELECT value FROM {self.table} WHERE key = ? AND (expires_at IS NULL OR expires_at >= ?)",
+            [key, time.time()],
+        )
+        return rows[0]["value"] if rows else None
+
+    def set(self, key: str, value: str, ttl: int = None):
+        self.db.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+            [key, value, time.time() + ttl if ttl else None],
+        )
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge_expired()
+
+    def delete(self, key: str):
+        self.db.execute(f"DELETE FROM {self.table} WHERE key = ?", [key])
+
+    def purge_expired(self) -> int:
+        """Drop expired entries, returns how many were removed"""
+        with self.db.conn:
+            self.db.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", [time.time()])
+            return self.db.conn.changes()
+
+
+class RedisBackend:
+    """Store in Redis (or a Redis-compatible server such as Valkey or KeyDB), shared across hosts"""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "frontline:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("The redis package is required for redis:// backends (pip install redis)")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+
+    def get(self, key: str):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: str, ttl: int = None):
+        self.client.set(self.prefix + key, value, ex=ttl)
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+
+def backend_from_url(url: str, db=None, reader=None):
+    """Build a backend from a setting: "memory", "sqlite" (needs db, reads via reader if given) or a redis:// URL"""
+    if url in (None, "", "memory"):
+        return MemoryBackend()
+    if url == "sqlite":
+        if db is None:
+            raise ValueError("The sqlite backend needs a database")
+        return SQLiteBackend(db, reader=reader)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    raise ValueError(f"Unknown backend: {url}")
+
+
+class BackendSessionMiddleware:
+    """Drop-in replacement for Starlette's SessionMiddleware that keeps session data server side.
+
+    The cookie only carries a signed random session id and the data lives in a
+    shared backend, so any worker (or node, with Redis) can serve any request and
+    sessions can be revoked by deleting the key.
+    """
+
+    def __init__(self, app, secret_key, session_cookie: str = "session", max_age: int = 14 * 24 * 60 * 60,
+                 path: str = "/", same_site: str = "lax", https_only: bool = False, domain: str = None,
+                 backend=None):
+        self.app = app
+        self.backend = backend or MemoryBackend()
+        self.signer = itsdangerous.TimestampSigner(str(secret_key))
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.path = path
+        self.security_flags = "httponly; samesite=" + same_site
+        if https_only:
+            self.security_flags += "; secure"
+        if domain is not None:
+            self.security_flags += f"; domain={domain}"
+
+    def _load(self, connection):
+        cookie = connection.cookies.get(self.session_cookie)
+        if not cookie:
+            return None, Session()
+        try:
+            session_id = self.signer.unsign(cookie.encode("utf-8"), max_age=self.max_age).decode("utf-8")
+        except BadSignature:
+            return None, Session()
+        data = self.backend.get(f"session:{session_id}")
+        return session_id, Session(json.loads(data) if data else {})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        session_id, scope["session"] = self._load(HTTPConnection(scope))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                session = scope["session"]
+                headers = MutableHeaders(scope=message)
+                if session.accessed:
+                    headers.add_vary_header("Cookie")
+                if session.modified and session:
+                    sid = session_id or secrets.token_urlsafe(32)
+                    self.backend.set(f"session:{sid}", json.dumps(session), ttl=self.max_age)
+                    if sid != session_id:
+                        headers.append("Set-Cookie", "{}={}; path={}; {}{}".format(
+                            self.session_cookie, self.signer.sign(sid).decode("utf-8"), self.path,
+                            f"Max-Age={self.max_age}; " if self.max_age is not None else "", self.security_flags,
+                        ))
+                elif session.modified and session_id:
+                    # The session has been cleared
+                    self.backend.delete(f"session:{session_id}")
+                    headers.append("Set-Cookie", "{}=null; path={}; expires=Thu, 01 Jan 1970 00:00:00 GMT; {}".format(
+                        self.session_cookie, self.path, self.security_flags,
+                    ))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,338 @@
+import os
+import re
+import json
+import hashlib
+import unicodedata
+from datetime import datetime, timedelta
+from utils import get_current_timestamp
+
+
+class TranscriptionCache:
+    """Persistent transcription cache keyed by the SHA-256 of the audio bytes and the model.
+
+    Duplicate uploads of the same recording cost a DB lookup instead of another
+    Whisper round trip. The table is bounded by the total size of the stored text;
+    once over budget the least recently used entries are evicted first.
+    """
+
+    def __init__(self, db, max_bytes: int = None):
+        self.db = db
+        self.max_bytes = max_bytes or int(os.getenv("TRANSCRIPTION_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        db.t.transcription_cache.create_index(["last_used_at"], if_not_exists=True)
+
+    def get(self, audio_hash: str, model: str):
+        """Return the cached transcription, or None on a miss"""
+        rows = self.db.q(
+            "SELECT transcription FROM transcription_cache WHERE audio_hash = ? AND model = ?",
+            [audio_hash, model],
+        )
+        if not rows:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute(
+            "UPDATE transcription_cache SET hits = hits + 1, last_used_at = ? WHERE audio_hash = ? AND model = ?",
+            [get_current_timestamp(), audio_hash, model],
+        )
+        return rows[0]["transcription"]
+
+    def put(self, audio_hash: str, model: str, transcription: str):
+        """Store a transcription and evict old entries if the cache is over budget"""
+        now = get_current_timestamp()
+        self.db.execute(
+            """
+            INSERT OR REPLACE INTO transcription_cache
+                (audio_hash, model, transcription, size, created_at, last_used_at, hits)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+            """,
+            [audio_hash, model, transcription, len(transcription.encode()), now, now],
+        )
+        self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the stored text fits in max_bytes"""
+        total = self.db.q("SELECT COALESCE(SUM(size), 0) AS total FROM transcription_cache")[0]["total"]
+        if total <= self.max_bytes:
+            return
+        with self.db.conn:
+            for row in self.db.q("SELECT audio_hash, model, size FROM transcription_cache ORDER BY last_used_at"):
+                if total <= self.max_bytes:
+                    break
+                self.db.execute(
+                    "DELETE FROM transcription_cache WHERE audio_hash = ? AND model = ?",
+                    [row["audio_hash"], row["model"]],
+                )
+                total -= row["size"]
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the current table size"""
+        row = self.db.q("SELECT COUNT(*) AS entries, COALESCE(SUM(size), 0) AS bytes FROM transcription_cache")[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": row["entries"],
+            "bytes": row["bytes"],
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def normalize_text(text: str) -> str:
+    """Canonical form used for cache keys: NFC, trimmed, whitespace runs collapsed.
+
+    Case is kept on purpose - part numbers and defect codes are case-sensitive
+    and the extraction result echoes them back.
+    """
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+class EntityCache:
+    """Persistent cache of extract_entities_from_text results.
+
+    Keyed on the hash of the normalized text, the model and the prompt version, so
+    re-extracting unchanged content (standard checklists, boilerplate notes) skips
+    the chat completion. Entries expire after ttl_seconds and the table is capped
+    at max_entries, evicting least recently used entries first. Entries written
+    under another prompt version can never be hit again and are purged.
+    """
+
+    def __init__(self, db, prompt_version: str, ttl_seconds: int = None, max_entries: int = None):
+        self.db = db
+        self.prompt_version = prompt_version
+        self.ttl_seconds = ttl_seconds or int(os.getenv("ENTITY_CACHE_TTL", str(7 * 24 * 3600)))
+        self.max_entries = max_entries or int(os.getenv("ENTITY_CACHE_MAX_ENTRIES", "5000"))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        db.t.entity_cache.create_index(["last_used_at"], if_not_exists=True)
+        self.purge_stale()
+
+    @staticmethod
+    def key(text: str) -> str:
+        return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+    def _cutoff(self) -> str:
+        return (datetime.now() - timedelta(seconds=self.ttl_seconds)).isoformat()
+
+    def get(self, text: str, model: str):
+        """Return the cached extraction result, or None on a miss or expired entry"""
+        text_hash = self.key(text)
+        rows = self.db.q(
+            "SELECT result, created_at FROM entity_cache WHERE text_hash = ? AND model = ? AND prompt_version = ?",
+            [text_hash, model, self.prompt_version],
+        )
+        if not rows or rows[0]["created_at"] < self._cutoff():
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.db.execute(
+            "UPDATE entity_cache SET hits = hits + 1, last_used_at = ? WHERE text_hash = ? AND model = ? AND prompt_version = ?",
+            [get_current_timestamp(), text_hash, model, self.prompt_version],
+        )
+        return json.loads(rows[0]["result"])
+
+    def put(self, text: str, model: str, result: dict):
+        """Store an extraction result and evict entries over the size cap"""
+        now = get_current_timestamp()
+        self.db.execute(
+            """
+            INSERT OR REPLACE INTO entity_cache
+                (text_hash, model, prompt_version, result, created_at, last_used_at, hits)
+            VALUES (?, ?, ?, ?, ?, ?, 0)
+            """,
+            [self.key(text), model, self.prompt_version, json.dumps(result), now, now],
+        )
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones beyond max_entries"""
+        with self.db.conn:
+            self.db.execute("DELETE FROM entity_cache WHERE created_at < ?", [self._cutoff()])
+            self.evictions += self.db.conn.changes()
+            self.db.execute(
+                """
+                DELETE FROM entity_cache WHERE rowid IN (
+                    SELECT rowid FROM entity_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                [self.max_entries],
+            )
+            self.evictions += self.db.conn.changes()
+
+    def purge_stale(self):
+        """Delete entries written with a different prompt template"""
+        self.db.execute("DELETE FROM entity_cache WHERE prompt_version != ?", [self.prompt_version])
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process plus the current table size"""
+        entries = self.db.q("SELECT COUNT(*) AS n FROM entity_cache")[0]["n"]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "prompt_version": self.prompt_version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def install_item_version_trigger(db) -> bool:
+    """Create the trigger that bumps input_item.version on every update.
+
+    Any write to an item (transcription edits, processing, file swaps) changes
+    its version, which is part of the fragment cache key. Returns True if the
+    trigger had to be created.
+    """
+    if any(t.name == "input_item_version_bump" for t in db.triggers):
+        return False
+    db.executescript("""
+        CREATE TRIGGER IF NOT EXISTS input_item_version_bump AFTER UPDATE ON input_item
+        WHEN NEW.version IS OLD.version BEGIN
+            UPDATE input_item SET version = COALESCE(OLD.version, 0) + 1 WHERE id = NEW.id;
+        END;
+    """)
+    return True
+
+
+class FragmentCache:
+    """Rendered input item card HTML keyed by (item id, workspace context, item version, pending).
+
+    Stored in the shared cache backend so every worker reuses the same renders.
+    A version bump makes older entries unreachable; invalidate() also deletes
+    them right away when an item is edited, removed or deleted.
+    """
+
+    # Bump whenever build_input_item_fragment's markup changes so stale renders are skipped
+    MARKUP_VERSION = 2
+
+    def __init__(self, backend, ttl_seconds: int = None):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds or int(os.getenv("FRAGMENT_CACHE_TTL", str(24 * 3600)))
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key(item_id: str, workspace_id, version: int, pending: bool) -> str:
+        return f"fragment:v{FragmentCache.MARKUP_VERSION}:{item_id}:{workspace_id or '-'}:{version or 0}:{int(bool(pending))}"
+
+    def get(self, item, workspace_id, pending: bool):
+        """Return the cached card HTML, or None on a miss"""
+        html = self.backend.get(self.key(item.id, workspace_id, item.version, pending))
+        if html is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return html
+
+    def set(self, item, workspace_id, pending: bool, html: str):
+        self.backend.set(self.key(item.id, workspace_id, item.version, pending), html, ttl=self.ttl_seconds)
+
+    def invalidate(self, item, workspace_ids=()):
+        """Drop an item's cards for the all-items view and the given workspaces"""
+        for workspace_id in [None, *workspace_ids]:
+            for pending in (False, True):
+                self.backend.delete(self.key(item.id, workspace_id, item.version, pending))
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Hit/miss counters for this process"""
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
+
+
+class WorkspaceSummaryCache:
+    """Last generated report per workspace plus a digest of every item it covered.
+
+    plan() compares the workspace's current item digests with the stored ones: an
+    unchanged workspace reuses the stored report, new or edited notes are sent on
+    their own together with the stored report as the summary of everything else,
+    and a removed note (whose content can't be taken back out of the summary), a
+    missing summary or a changed prompt means a full rebuild.
+    """
+
+    def __init__(self, db, prompt_version: str):
+        self.db = db
+        self.prompt_version = prompt_version
+        self.reused = 0
+        self.incremental = 0
+        self.full = 0
+        self.items_skipped = 0
+
+    @staticmethod
+    def item_digest(item: dict) -> str:
+        """Hash of everything about an item that goes into the report prompt"""
+        content = "\0".join(str(item.get(k) or "") for k in ("filename", "type", "transcription", "extracted_data"))
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def plan(self, workspace_id: str, items_data: list) -> dict:
+        """Decide how to (re)generate a workspace's report.
+
+        Returns {"mode": "reuse" | "incremental" | "full", "items": items to send,
+        "previous_report": stored report or None, "digests": current digests}.
+        """
+        digests = {item["id"]: self.item_digest(item) for item in items_data}
+        rows = self.db.q(
+            "SELECT item_digests, report FROM workspace_summary WHERE workspace_id = ? AND prompt_version = ?",
+            [workspace_id, self.prompt_version],
+        )
+        stored = json.loads(rows[0]["item_digests"]) if rows else None
+        if stored is None or not stored.keys() <= digests.keys():
+            self.full += 1
+            return {"mode": "full", "items": items_data, "previous_report": None, "digests": digests}
+
+        previous_report = json.loads(rows[0]["report"])
+        changed = [
+            {**item, "revised": item["id"] in stored}
+            for item in items_data if stored.get(item["id"]) != digests[item["id"]]
+        ]
+        self.items_skipped += len(items_data) - len(changed)
+        if not changed:
+            self.reused += 1
+            return {"mode": "reuse", "items": [], "previous_report": previous_report, "digests": digests}
+        self.incremental += 1
+        return {"mode": "incremental", "items": changed, "previous_report": previous_report, "digests": digests}
+
+    def store(self, workspace_id: str, digests: dict, report: dict):
+        """Remember a generated report and the item digests it was built from"""
+        now = get_current_timestamp()
+        self.db.execute(
+            """
+            INSERT INTO workspace_summary (workspace_id, prompt_version, item_digests, report, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (workspace_id) DO UPDATE SET
+                prompt_version = excluded.prompt_version, item_digests = excluded.item_digests,
+                report = excluded.report, updated_at = excluded.updated_at
+            """,
+            [workspace_id, self.prompt_version, json.dumps(digests), json.dumps(report), now, now],
+        )
+
+    def forget(self, workspace_id: str):
+        """Drop a workspace's stored report (the workspace was deleted)"""
+        self.db.execute("DELETE FROM workspace_summary WHERE workspace_id = ?", [workspace_id])
+
+    def stats(self) -> dict:
+        return {
+            "summaries": self.db.q("SELECT COUNT(*) AS n FROM workspace_summary")[0]["n"],
+            "prompt_version": self.prompt_version,
+            "reused": self.reused,
+            "incremental": self.incremental,
+            "full": self.full,
+            "items_skipped": self.items_skipped,
+        }
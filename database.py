@@ -0,0 +1,123 @@
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+import apsw
+from fastlite import Database, database
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker only
+    fcntl = None
+
+DB_PATH = os.getenv("FRONTLINE_DB", "data/frontline.db")
+
+# Per-connection settings; journal_mode=WAL is set by the writer and persists in the file
+PRAGMAS = {
+    "synchronous": "NORMAL",  # fsync at checkpoints only, safe with WAL
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_KB", "65536")),  # negative means KiB
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+
+def apply_pragmas(db):
+    for name, value in PRAGMAS.items():
+        db.execute(f"PRAGMA {name} = {value}")
+    return db
+
+
+# Held by every statement and transaction on the writer connection
+_write_lock = threading.RLock()
+
+
+class WriterConnection(apsw.Connection):
+    """The shared read-write connection, serialized by the process-wide write lock.
+
+    Request threads, job workers and `asyncio.to_thread` calls all share it, so
+    each statement and each `with db.conn:` block holds the lock; otherwise a
+    write from one thread could land inside another thread's open savepoint and
+    be committed or rolled back with it.
+    """
+
+    def execute(self, *args, **kwargs):
+        with _write_lock:
+            return super().execute(*args, **kwargs)
+
+    def executemany(self, *args, **kwargs):
+        with _write_lock:
+            return super().executemany(*args, **kwargs)
+
+    def __enter__(self):
+        _write_lock.acquire()
+        try:
+            return super().__enter__()
+        except BaseException:
+            _write_lock.release()
+            raise
+
+    def __exit__(self, *exc_info):
+        try:
+            return super().__exit__(*exc_info)
+        finally:
+            _write_lock.release()
+
+
+def connect_writer(path=DB_PATH):
+    """Open the read-write connection that every write goes through (enables WAL)"""
+    path = Path(path)
+    path.parent.mkdir(exist_ok=True)
+    db = Database(WriterConnection(str(path)))
+    db.enable_wal()
+    return apply_pragmas(db)
+
+
+def connect_reader(path=DB_PATH):
+    """Open a read-only connection; under WAL it never waits on the writer's commits"""
+    return apply_pragmas(database(path, wal=False, flags=apsw.SQLITE_OPEN_READONLY))
+
+
+db = connect_writer()
+_readers = threading.local()
+
+
+def read_db():
+    """Return this thread's read-only connection, opening it on first use.
+
+    Sync routes run in the threadpool and async routes on the event loop thread,
+    so each gets its own reader and dashboard/listing queries read the last
+    committed snapshot instead of queueing behind an upload on the writer.
+    """
+    reader = getattr(_readers, "db", None)
+    if reader is None:
+        reader = _readers.db = connect_reader()
+    return reader
+
+
+@contextmanager
+def write_transaction():
+    """Group several writes into one transaction on the writer, one thread at a time.
+
+    Blocks while another thread writes, so async code runs its transactions
+    with `asyncio.to_thread` rather than on the event loop.
+    """
+    with db.conn:
+        yield db
+
+
+@contextmanager
+def schema_lock(path=DB_PATH):
+    """Hold an exclusive lock file while creating/migrating tables at startup.
+
+    Worker processes launched together otherwise race on CREATE/ALTER TABLE.
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(Path(path).with_suffix(".lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
@@ -0,0 +1,125 @@
+import argparse
+import json
+import re
+
+ENTITY_KINDS = ["equipment", "part", "defect"]
+# InputItem.extracted_data list field -> entity kind
+EXTRACTED_ENTITY_FIELDS = {"equipment_ids": "equipment", "part_numbers": "part", "defect_codes": "defect"}
+
+
+ENTITY_REPORTS_SQL = """
+    SELECT r.id, r.title, r.status, r.priority, r.created_at FROM entity_ref e
+    JOIN maintenance_report r ON r.id = e.source_id
+    WHERE e.kind = ? AND e.value = ? AND e.user_id = ? AND e.source_type = 'report'
+    ORDER BY r.created_at DESC
+"""
+ENTITY_ITEMS_SQL = """
+    SELECT i.id, i.original_filename, i.file_type, i.uploaded_at FROM entity_ref e
+    JOIN input_item i ON i.id = e.source_id
+    WHERE e.kind = ? AND e.value = ? AND e.user_id = ? AND e.source_type = 'input_item'
+    ORDER BY i.uploaded_at DESC
+"""
+# History lookups checked by check_query_plans at startup
+ENTITY_QUERIES = {"entity_reports": ENTITY_REPORTS_SQL, "entity_items": ENTITY_ITEMS_SQL}
+
+
+def normalize_entity(value) -> str:
+    """Lookup form of an identifier: trimmed, single-spaced, upper-case"""
+    return re.sub(r"\s+", " ", str(value)).strip().upper()
+
+
+def _json_list(text) -> list:
+    try:
+        data = json.loads(text) if text else []
+    except (TypeError, ValueError):
+        return []
+    return data if isinstance(data, list) else []
+
+
+def item_entities(extracted_data: str) -> list:
+    """(kind, value) pairs named in an input item's extracted_data JSON"""
+    try:
+        data = json.loads(extracted_data) if extracted_data else {}
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(data, dict):
+        return []
+    pairs = []
+    for field, kind in EXTRACTED_ENTITY_FIELDS.items():
+        values = data.get(field) or []
+        pairs += [(kind, value) for value in (values if isinstance(values, list) else [values])]
+    return pairs
+
+
+def report_entities(report) -> list:
+    """(kind, value) pairs named by a maintenance report (object or dict)"""
+    get = report.get if isinstance(report, dict) else lambda key: getattr(report, key, None)
+    pairs = [("equipment", value) for value in (get("equipment_id") or "").split(",")]
+    pairs += [("part", value) for value in _json_list(get("part_numbers"))]
+    pairs += [("defect", value) for value in _json_list(get("defect_codes"))]
+    return pairs
+
+
+def ensure_entity_indexes(db):
+    """Index entity refs by value for history lookups (the pk covers per-source deletes)"""
+    db.t.entity_ref.create_index(["kind", "value", "user_id"], if_not_exists=True)
+
+
+def index_entities(db, source_type: str, source_id: str, user_id: int, pairs: list) -> int:
+    """Replace the entity refs of one item or report; returns how many were stored"""
+    rows = {}
+    for kind, display in pairs:
+        value = normalize_entity(display)
+        if value and kind in ENTITY_KINDS:
+            rows.setdefault((kind, value), str(display).strip())
+    db.execute("DELETE FROM entity_ref WHERE source_type = ? AND source_id = ?", [source_type, source_id])
+    for (kind, value), display in rows.items():
+        db.execute(
+            "INSERT INTO entity_ref (kind, value, source_type, source_id, user_id, display) VALUES (?, ?, ?, ?, ?, ?)",
+            [kind, value, source_type, source_id, user_id, display],
+        )
+    return len(rows)
+
+
+def index_item_entities(db, item_id: str, user_id: int, extracted_data: str) -> int:
+    return index_entities(db, "input_item", item_id, user_id, item_entities(extracted_data))
+
+
+def index_report_entities(db, report_id: str, user_id: int, report) -> int:
+    return index_entities(db, "report", report_id, user_id, report_entities(report))
+
+
+def remove_entity_refs(db, source_type: str, source_id: str):
+    db.execute("DELETE FROM entity_ref WHERE source_type = ? AND source_id = ?", [source_type, source_id])
+
+
+def rebuild_entity_refs(db) -> int:
+    """Re-derive every entity ref from input_item and maintenance_report"""
+    with db.conn:
+        db.execute("DELETE FROM entity_ref")
+        for row in db.q("SELECT id, user_id, extracted_data FROM input_item WHERE extracted_data != ''"):
+            index_item_entities(db, row["id"], row["user_id"], row["extracted_data"])
+        for row in db.q("SELECT id, user_id, equipment_id, part_numbers, defect_codes FROM maintenance_report"):
+            index_report_entities(db, row["id"], row["user_id"], row)
+    return db.q("SELECT COUNT(*) AS n FROM entity_ref")[0]["n"]
+
+
+def entity_history(db, user_id: int, kind: str, value: str) -> dict:
+    """Reports and input items of a user that mention one entity, newest first"""
+    params = [kind, normalize_entity(value), user_id]
+    return {
+        "reports": db.q(ENTITY_REPORTS_SQL, params),
+        "items": db.q(ENTITY_ITEMS_SQL, params),
+    }
+
+
+if __name__ == "__main__":
+    from database import connect_writer
+
+    parser = argparse.ArgumentParser(description="Maintain the entity_ref inverted index")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--db", default="data/frontline.db")
+    args = parser.parse_args()
+
+    db = connect_writer(args.db)
+    print(f"Indexed {rebuild_entity_refs(db)} entity reference(s)")
@@ -0,0 +1,97 @@
+import os
+import re
+import threading
+from pathlib import Path
+from PIL import Image, ImageOps, features
+
+# Derivative name -> longest edge in pixels
+IMAGE_SIZES = {"thumb": 256, "medium": 1024}
+DERIVATIVE_FORMAT = "webp" if features.check("webp") else "jpg"
+DERIVATIVE_QUALITY = int(os.getenv("IMAGE_DERIVATIVE_QUALITY", "80"))
+DERIVATIVE_NAME_RE = re.compile(rf"^(?P<stem>[\w-]+)\.(?P<size>{'|'.join(IMAGE_SIZES)})\.(?:webp|jpg)$")
+
+
+def derivative_path(original, size: str) -> Path:
+    """Where the `size` derivative of an original image is stored (next to the original)"""
+    original = Path(original)
+    return original.with_name(f"{original.stem}.{size}.{DERIVATIVE_FORMAT}")
+
+
+def derivative_url(original, size: str) -> str:
+    return f"uploads/images/{derivative_path(original, size).name}"
+
+
+def generate_derivative(original, size: str) -> Path:
+    """Write one resized copy of an image, returning its path.
+
+    Written to a temp file and renamed into place so concurrent lazy requests
+    never serve a half-written file.
+    """
+    target = derivative_path(original, size)
+    edge = IMAGE_SIZES[size]
+    with Image.open(original) as img:
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((edge, edge), Image.Resampling.LANCZOS)
+        if DERIVATIVE_FORMAT == "jpg":
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.mode or "transparency" in img.info else "RGB")
+        tmp = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        img.save(tmp, "WEBP" if DERIVATIVE_FORMAT == "webp" else "JPEG", quality=DERIVATIVE_QUALITY)
+    os.replace(tmp, target)
+    return target
+
+
+def generate_derivatives(original) -> dict:
+    """Create every missing derivative of an image; returns {size: path}"""
+    paths = {}
+    for size in IMAGE_SIZES:
+        path = derivative_path(original, size)
+        paths[size] = path if path.exists() else generate_derivative(original, size)
+    return paths
+
+
+def remove_derivatives(original):
+    """Delete the derivatives of an image whose original was replaced or deleted"""
+    for size in IMAGE_SIZES:
+        derivative_path(original, size).unlink(missing_ok=True)
+
+
+def resolve_derivative(image_dir: Path, filename: str):
+    """Generate a requested derivative on first request.
+
+    Returns the derivative's path, or None when `filename` is not a derivative
+    name or its original is gone.
+    """
+    match = DERIVATIVE_NAME_RE.match(filename)
+    if not match:
+        return None
+    originals = [
+        p for p in image_dir.glob(f"{match['stem']}.*")
+        if not DERIVATIVE_NAME_RE.match(p.name) and not p.name.startswith(".")
+    ]
+    if not originals:
+        return None
+    try:
+        return generate_derivative(originals[0], match["size"])
+    except OSError:
+        return None
+
+
+def derivative_width(original, size: str):
+    """Pixel width of a generated derivative (read from its header), or None if it doesn't exist yet"""
+    try:
+        with Image.open(derivative_path(original, size)) as img:
+            return img.width
+    except OSError:
+        return None
+
+
+def image_srcset(original):
+    """srcset listing the generated derivatives by their actual width, or None if there are none yet.
+
+    IMAGE_SIZES bounds the longest edge, so a portrait image's derivatives are
+    narrower than their nominal size; missing ones are left to the plain src.
+    """
+    widths = {size: derivative_width(original, size) for size in IMAGE_SIZES}
+    return ", ".join(f"{derivative_url(original, size)} {width}w" for size, width in widths.items() if width) or None
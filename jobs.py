@@ -0,0 +1,194 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+from models import Job
+from utils import generate_uuid, get_current_timestamp
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobQueue:
+    """Durable SQLite-backed job queue drained by asyncio worker tasks.
+
+    Jobs are rows in the job table, so they survive restarts. Workers claim the
+    oldest queued job with a single UPDATE ... RETURNING, which is atomic even
+    when several app processes share the database. Failed jobs are retried up to
+    max_attempts; running jobs whose worker disappeared are requeued once their
+    lease expires. Kinds registered with a batch_size are claimed and handled
+    several queued jobs at a time.
+
+    Claims and status updates hold the writer, so workers run them with
+    `asyncio.to_thread`; the status checks used while rendering go through
+    `reader` (a callable returning a read-only connection) when given.
+    """
+
+    def __init__(self, db, workers: int = None, poll_interval: float = 2.0, max_attempts: int = 3, lease_seconds: int = None,
+                 reader=None):
+        self.db = db
+        self.reader = reader or (lambda: db)
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds or int(os.getenv("JOB_LEASE_SECONDS", "600"))
+        self.handlers = {}
+        self.batch_sizes = {}
+        self._tasks = []
+        self._wakeup = None
+        self._loop = None
+        db.t.job.create_index(["status", "created_at"], if_not_exists=True)
+        db.t.job.create_index(["input_item_id", "status"], if_not_exists=True)
+
+    def handler(self, kind: str, batch_size: int = 1):
+        """Decorator registering the coroutine that runs jobs of a kind.
+
+        With batch_size > 1 the coroutine is called with a list of up to that many
+        jobs and returns {job_id: error} for the ones that failed.
+        """
+        def register(func):
+            self.handlers[kind] = func
+            self.batch_sizes[kind] = max(1, batch_size)
+            return func
+        return register
+
+    def enqueue(self, kind: str, input_item_id: str, user_id: int) -> str:
+        """Add a job and wake an idle worker; returns the job id (safe to call from any thread)"""
+        job_id = generate_uuid()
+        now = get_current_timestamp()
+        self.db.t.job.insert(dict(
+            id=job_id, kind=kind, input_item_id=input_item_id, user_id=user_id,
+            status="queued", attempts=0, error="", created_at=now, updated_at=now,
+        ))
+        if self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return job_id
+
+    def claim(self):
+        """Atomically mark the oldest queued job as running and return it"""
+        rows = self.db.q(
+            """
+            UPDATE job SET status = 'running', attempts = attempts + 1, updated_at = ?
+            WHERE status = 'queued' AND id = (
+                SELECT id FROM job WHERE status = 'queued' ORDER BY created_at LIMIT 1
+            )
+            RETURNING *
+            """,
+            [get_current_timestamp()],
+        )
+        return Job(**rows[0]) if rows else None
+
+    def claim_kind(self, kind: str, limit: int) -> list:
+        """Atomically claim up to `limit` more queued jobs of one kind, oldest first"""
+        rows = self.db.q(
+            """
+            UPDATE job SET status = 'running', attempts = attempts + 1, updated_at = ?
+            WHERE status = 'queued' AND id IN (
+                SELECT id FROM job WHERE status = 'queued' AND kind = ? ORDER BY created_at LIMIT ?
+            )
+            RETURNING *
+            """,
+            [get_current_timestamp(), kind, limit],
+        )
+        return [Job(**row) for row in rows]
+
+    def _finish(self, job, error: str = None):
+        if error is None:
+            status = "done"
+        else:
+            status = "queued" if job.attempts < self.max_attempts else "failed"
+        self.db.execute(
+            "UPDATE job SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+            [status, error or "", get_current_timestamp(), job.id],
+        )
+
+    async def run_job(self, job):
+        """Run one claimed job with its handler (batched with other queued jobs of its kind) and record the outcome"""
+        handler = self.handlers.get(job.kind)
+        batch_size = self.batch_sizes.get(job.kind, 1)
+        jobs = [job] + (await asyncio.to_thread(self.claim_kind, job.kind, batch_size - 1) if batch_size > 1 else [])
+        try:
+            if handler is None:
+                raise RuntimeError(f"No handler registered for job kind '{job.kind}'")
+            if batch_size > 1:
+                errors = await handler(jobs) or {}
+            else:
+                await handler(job)
+                errors = {}
+        except Exception as e:
+            errors = {j.id: str(e) or e.__class__.__name__ for j in jobs}
+        for j in jobs:
+            if j.id in errors:
+                print(f"Job {j.id} ({j.kind}) failed on attempt {j.attempts}: {errors[j.id]}")
+            await asyncio.to_thread(self._finish, j, errors.get(j.id))
+
+    async def _worker(self):
+        while True:
+            job = await asyncio.to_thread(self.claim)
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.run_job(job)
+
+    def requeue_expired(self) -> int:
+        """Requeue running jobs whose worker stopped without finishing them"""
+        cutoff = (datetime.now() - timedelta(seconds=self.lease_seconds)).isoformat()
+        with self.db.conn:
+            self.db.execute(
+                "UPDATE job SET status = 'queued', updated_at = ? WHERE status = 'running' AND updated_at < ?",
+                [get_current_timestamp(), cutoff],
+            )
+            return self.db.conn.changes()
+
+    async def start(self):
+        """Start the worker tasks (called at app startup)"""
+        if self._tasks:
+            return
+        await asyncio.to_thread(self.requeue_expired)
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the worker tasks (called at app shutdown); unfinished jobs are requeued on next start"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    def has_active_job(self, input_item_id: str) -> bool:
+        """Check whether an input item still has queued or running jobs"""
+        return bool(self.reader().q(
+            "SELECT 1 FROM job WHERE input_item_id = ? AND status IN ('queued', 'running') LIMIT 1",
+            [input_item_id],
+        ))
+
+    def active_item_ids(self, input_item_ids: list) -> set:
+        """Return which of these input items still have queued or running jobs"""
+        if not input_item_ids:
+            return set()
+        placeholders = ", ".join("?" for _ in input_item_ids)
+        rows = self.reader().q(
+            f"SELECT DISTINCT input_item_id FROM job WHERE status IN ('queued', 'running') AND input_item_id IN ({placeholders})",
+            list(input_item_ids),
+        )
+        return {row["input_item_id"] for row in rows}
+
+    async def wait_for_items(self, input_item_ids: list, timeout: float = 60.0) -> set:
+        """Wait until these input items have no queued or running jobs; returns the ids still active at the timeout"""
+        deadline = asyncio.get_running_loop().time() + timeout
+        active = self.active_item_ids(input_item_ids)
+        while active and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(min(self.poll_interval, 0.5))
+            active = self.active_item_ids(list(active))
+        return active
+
+    def stats(self) -> dict:
+        """Job counts by status plus the number of live worker tasks"""
+        counts = {status: 0 for status in ("queued", "running", "done", "failed")}
+        for row in self.reader().q("SELECT status, COUNT(*) AS n FROM job GROUP BY status"):
+            counts[row["status"]] = row["n"]
+        return {"workers": len([t for t in self._tasks if not t.done()]), **counts}
@@ -0,0 +1,44 @@
+import os
+import argparse
+import uvicorn
+from backends import DEFAULT_SESSION_BACKEND, DEFAULT_CACHE_BACKEND
+
+# Production entry point: python launch.py --workers 4
+# Runs main:app under uvicorn worker processes. Any worker can serve any request
+# (no sticky sessions needed) as long as sessions and caches use a shared backend.
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Frontline with multiple uvicorn workers")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5001")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))))
+    parser.add_argument("--session-backend", default=os.getenv("SESSION_BACKEND", DEFAULT_SESSION_BACKEND),
+                        help='"cookie" (signed cookie), "sqlite" or a redis:// URL')
+    parser.add_argument("--cache-backend", default=os.getenv("CACHE_BACKEND", DEFAULT_CACHE_BACKEND),
+                        help='"memory" (per worker), "sqlite" or a redis:// URL')
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if args.workers > 1 and args.cache_backend == "memory":
+        print("Warning: the memory cache backend is per worker; use sqlite or redis:// with several workers")
+    if "SESSION_SECRET" not in os.environ:
+        print("Warning: SESSION_SECRET is not set, using the insecure default key")
+
+    # Worker processes import main fresh, so settings travel through the environment
+    os.environ["SESSION_BACKEND"] = args.session_backend
+    os.environ["CACHE_BACKEND"] = args.cache_backend
+
+    uvicorn.run(
+        "main:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        log_level=args.log_level,
+    )
+
+
+if __name__ == "__main__":
+    main()
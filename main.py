@@ -1,14 +1,38 @@
 from fasthtml.common import *
 from fastlite import *
 from pathlib import Path
+import asyncio
 import json
-from datetime import datetime
+import re
+import time
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta
 import aiofiles
 from ai_services import *
 from models import *
 from utils import *
+from database import db, read_db, write_transaction, schema_lock
+from queries import *
+from stats import *
+from search import install_search_index, rebuild_search_index, search_index_in_sync, search_input_items, search_reports
+from entities import (
+    ENTITY_KINDS, ENTITY_QUERIES, ensure_entity_indexes, entity_history, index_item_entities,
+    index_report_entities, rebuild_entity_refs, remove_entity_refs,
+)
+from cache import TranscriptionCache, EntityCache, FragmentCache, WorkspaceSummaryCache, install_item_version_trigger
+from jobs import JobQueue
+from images import derivative_url, image_srcset, generate_derivatives, remove_derivatives, resolve_derivative
+from backends import BackendSessionMiddleware, backend_from_url, DEFAULT_SESSION_BACKEND, DEFAULT_CACHE_BACKEND
+from functools import partial
 from monsterui.all import *
 from css import css
+from urllib.parse import quote
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-worker only, chunk writes are guarded in-process
+    fcntl = None
 
 # Create necessary directories
 upload_dir = Path("uploads")
@@ -16,20 +40,66 @@ upload_dir.mkdir(exist_ok=True)
 (upload_dir / "audio").mkdir(exist_ok=True)
 (upload_dir / "images").mkdir(exist_ok=True)
 (upload_dir / "text").mkdir(exist_ok=True)
+partial_dir = upload_dir / "partial"
+partial_dir.mkdir(exist_ok=True)
 data_dir = Path("data")
 data_dir.mkdir(exist_ok=True)
 
-db = database("data/frontline.db")
-
-users = db.create(User, pk="id", transform=True)
-workspaces = db.create(Workspace, pk="id", transform=True)
-input_items = db.create(InputItem, pk="id", transform=True)
-maintenance_reports = db.create(MaintenanceReport, pk="id", transform=True)
-report_annotations = db.create(ReportAnnotation, pk="id", transform=True)
+# Rows rendered per request on the infinite-scroll listing pages
+PAGE_SIZE = 20
+# Workspace items transcribed/extracted at the same time by process_items
+PROCESS_CONCURRENCY = int(os.getenv("PROCESS_CONCURRENCY", "4"))
+# Bytes copied per read when storing uploads, and the chunk size resumable clients send
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+# Resumable uploads untouched for this long are deleted with their partial files
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+# Every worker must share the secret; "cookie" sessions need nothing else to work across workers
+SESSION_SECRET = os.getenv("SESSION_SECRET", "your-secret-key-change-in-production")
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", DEFAULT_SESSION_BACKEND)  # cookie, sqlite or redis://...
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", DEFAULT_CACHE_BACKEND)  # memory, sqlite or redis://...
+
+# Schema setup and migrations run once at a time when several workers start together
+with schema_lock():
+    users = db.create(User, pk="id", transform=True)
+    workspaces = db.create(Workspace, pk="id", transform=True)
+    input_items = db.create(InputItem, pk="id", transform=True)
+    maintenance_reports = db.create(MaintenanceReport, pk="id", transform=True)
+    report_annotations = db.create(ReportAnnotation, pk="id", transform=True)
+    workspace_items = db.create(WorkspaceItem, pk=("workspace_id", "input_item_id"), transform=True)
+    user_stats = db.create(UserStats, pk="user_id", transform=True)
+    db.create(TranscriptionCacheEntry, name="transcription_cache", pk=("audio_hash", "model"), transform=True)
+    db.create(EntityCacheEntry, name="entity_cache", pk=("text_hash", "model", "prompt_version"), transform=True)
+    workspace_items.create_index(["workspace_id", "added_at"], if_not_exists=True)
+    workspace_items.create_index(["input_item_id"], if_not_exists=True)
+    migrate_workspace_item_ids(db)
+    ensure_stats_indexes(db)
+    ensure_listing_indexes(db)
+    ensure_lookup_indexes(db)
+    if install_user_stats_triggers(db):
+        rebuild_user_stats(db)
+    transcription_cache = TranscriptionCache(db)
+    entity_cache = EntityCache(db, ENTITY_PROMPT_VERSION)
+    jobs = db.create(Job, pk="id", transform=True)
+    upload_sessions = db.create(UploadSession, pk="id", transform=True)
+    db.create(WorkspaceSummary, name="workspace_summary", pk="workspace_id", transform=True)
+    workspace_summaries = WorkspaceSummaryCache(db, REPORT_PROMPT_VERSION)
+    job_queue = JobQueue(db, reader=read_db)
+    entity_refs_new = not db.t.entity_ref.exists()
+    db.create(EntityRef, name="entity_ref", pk=("source_type", "source_id", "kind", "value"), transform=True)
+    ensure_entity_indexes(db)
+    if entity_refs_new:
+        rebuild_entity_refs(db)
+    check_query_plans(db, {**INDEXED_QUERIES, **ENTITY_QUERIES})
+    cache_backend = backend_from_url(CACHE_BACKEND, db, read_db)
+    session_backend = None if SESSION_BACKEND == "cookie" else backend_from_url(SESSION_BACKEND, db, read_db)
+    install_item_version_trigger(db)
+    fragment_cache = FragmentCache(cache_backend)
+    if install_search_index(db) or not search_index_in_sync(db):
+        rebuild_search_index(db)
 
 # SPA Components
 def create_recent_reports_section(user_id: int, swap_oob: bool = False):
-    recent_reports = sorted(maintenance_reports(where=f"user_id = {user_id}"), key=lambda r: r.created_at, reverse=True)[:3]
+    recent = recent_reports(read_db(), user_id, limit=3)
     return Div(
         *(
             [
@@ -50,9 +120,9 @@ def create_recent_reports_section(user_id: int, swap_oob: bool = False):
                     hx_target="#main-content",
                     cls="p-3 mb-2 rounded-md cursor-pointer transition-colors hover:bg-secondary border border-transparent",
                 )
-                for report in recent_reports
+                for report in recent
             ]
-            if recent_reports
+            if recent
             else [
                 P("No reports yet", cls=TextPresets.muted_sm)
             ]
@@ -63,9 +133,9 @@ def create_recent_reports_section(user_id: int, swap_oob: bool = False):
 
 
 def create_dashboard_stats_section(user_id: int, swap_oob: bool = False):
-    user_reports = maintenance_reports(where=f"user_id = {user_id}")
-    dashboard_stats =  {"total": len(user_reports), "open": len([r for r in user_reports if r.status == "open"]),
-                        "critical": len([r for r in user_reports if r.priority == "critical"])}
+    counts = get_user_stats(read_db(), user_id)
+    dashboard_stats = {"total": counts["total"], "open": counts["status"]["open"],
+                       "critical": counts["priority"]["critical"]}
     return Div(
         Div(f"Total Reports: {dashboard_stats['total']}", cls="mb-2"),
         Div(f"Open: {dashboard_stats['open']}", cls="mb-2"),
@@ -80,7 +150,7 @@ def create_dashboard_stats_section(user_id: int, swap_oob: bool = False):
 
 def create_recent_uploads_section(user_id: int, swap_oob: bool = False):
     """Create recent uploads section with optional swap-oob"""
-    recent_uploads = sorted(input_items(where=f"user_id = {user_id}"), key=lambda i: i.uploaded_at, reverse=True)[:3]
+    recent_uploads = recent_input_items(read_db(), user_id, limit=3)
     return Div(
         *(
             [
@@ -115,7 +185,8 @@ def create_recent_uploads_section(user_id: int, swap_oob: bool = False):
 
 def create_recent_workspaces_section(user_id: int, swap_oob: bool = False):
     """Create recent workspaces section with optional swap-oob"""
-    recent_workspaces = sorted(workspaces(where=f"user_id = {user_id}"), key=lambda w: w.updated_at, reverse=True)[:3]
+    recent = recent_workspaces(read_db(), user_id, limit=3)
+    item_counts = count_items_for_workspaces(read_db(), [workspace.id for workspace in recent])
     return Div(
         *(
             [
@@ -129,16 +200,16 @@ def create_recent_workspaces_section(user_id: int, swap_oob: bool = False):
                         cls=TextT.medium,
                     ),
                     Div(
-                        f"{workspace.status.title()} • {len(json.loads(workspace.input_item_ids or '[]'))} items",
+                        f"{workspace.status.title()} • {item_counts[workspace.id]} items",
                         cls=TextPresets.muted_sm,
                     ),
                     hx_get=f"/content/workspace/{workspace.id}",
                     hx_target="#main-content",
                     cls="p-3 mb-2 rounded-md cursor-pointer transition-colors hover:bg-secondary border border-transparent",
                 )
-                for workspace in recent_workspaces
+                for workspace in recent
             ]
-            if recent_workspaces
+            if recent
             else [
                 Div("No workspaces yet.", cls=TextPresets.muted_sm)
             ]
@@ -148,8 +219,12 @@ def create_recent_workspaces_section(user_id: int, swap_oob: bool = False):
     )
 
 
-def build_input_item_fragment(item, workspace_id=None):
-    """Build a unified input item fragment for any context"""
+def build_input_item_fragment(item, workspace_id=None, pending: bool = False):
+    """Build a unified input item fragment for any context.
+
+    `pending` (the item still has a background job) comes from the caller, which
+    looks it up once for a whole list with job_queue.active_item_ids.
+    """
     
     # File type icon mapping
     file_icons = {
@@ -164,7 +239,15 @@ def build_input_item_fragment(item, workspace_id=None):
     
     # Transcription/content section for audio and text files
     if item.file_type == "audio":
-        if item.transcription:
+        if pending and not item.transcription:
+            content_sections.append(
+                DivLAligned(
+                    Loading(cls=(LoadingT.dots, LoadingT.sm)),
+                    Span("Transcribing...", cls=TextPresets.muted_sm),
+                    cls="space-x-2 mb-4"
+                )
+            )
+        elif item.transcription:
             # Show preview of transcription (clickable to edit)
             preview = item.transcription[:80] + "..." if len(item.transcription) > 80 else item.transcription
             content_sections.append(
@@ -218,7 +301,11 @@ def build_input_item_fragment(item, workspace_id=None):
         content_sections.append(
             Center(
                 Img(
-                    src=f"uploads/images/{Path(item.file_path).name}",
+                    src=derivative_url(item.file_path, "thumb"),
+                    srcset=image_srcset(item.file_path),
+                    sizes="128px",
+                    loading="lazy",
+                    decoding="async",
                     alt=f"Preview of {item.original_filename}",
                     cls="max-w-32 max-h-24 rounded object-cover shadow-sm"
                 ),
@@ -300,16 +387,92 @@ def build_input_item_fragment(item, workspace_id=None):
                     Label(item.file_type.title(), cls=LabelT.primary),
                     Label(f"{(item.file_size / 1024):.1f} KB", cls=LabelT.secondary),
                     Small(datetime.fromisoformat(item.uploaded_at).strftime('%m/%d %H:%M'), cls=TextPresets.muted_sm),
+                    *([Label("Processing", cls=LabelT.secondary)] if pending else []),
                     cls="space-x-2 mb-3"
                 ),
                 *content_sections
             )
         ),
         cls=(CardT.default, "mb-4", "input-item-article"),
-        id=f"input-article-{item.id}"
+        id=f"input-article-{item.id}",
+        # Poll until the background job finishes; the refreshed card drops the trigger
+        **({"hx_get": f"/input-item-card/{item.id}" + (f"?workspace_id={workspace_id}" if workspace_id else ""),
+            "hx_trigger": "every 2s", "hx_swap": "outerHTML"} if pending else {})
+    )
+
+
+def render_input_item_fragment(item, workspace_id=None, pending: bool = False):
+    """Cached HTML of build_input_item_fragment, so list re-renders are string joins"""
+    html = fragment_cache.get(item, workspace_id, pending)
+    if html is None:
+        html = to_xml(build_input_item_fragment(item, workspace_id, pending=pending))
+        fragment_cache.set(item, workspace_id, pending, html)
+    return NotStr(html)
+
+
+def item_pending(item) -> bool:
+    """Whether a single card's item still has a background job"""
+    return not item.processed and job_queue.has_active_job(item.id)
+
+
+def render_input_item_fragments(items, workspace_id=None):
+    """Render a list of item cards with one job lookup for the whole list"""
+    active = job_queue.active_item_ids([item.id for item in items if not item.processed])
+    return [render_input_item_fragment(item, workspace_id, pending=item.id in active) for item in items]
+
+
+def invalidate_item_fragments(item, user_id: int):
+    """Drop an item's cached cards in every context it is shown in"""
+    fragment_cache.invalidate(item, item_workspace_ids(read_db(), item.id, user_id))
+
+
+def create_workspace_items_empty():
+    return Center(
+        DivVStacked(
+            UkIcon("inbox", height=48, width=48, cls="mx-auto text-muted-foreground mb-4"),
+            P("No items added yet", cls=TextT.medium),
+            P("Upload files or add existing items to get started", cls=TextPresets.muted_sm),
+            cls="text-center py-8"
+        ),
+        id="ingested-items-empty",
     )
 
 
+def create_workspace_items_count(workspace_id: str, count: int = None, swap_oob: bool = False):
+    """Create the workspace item count label with optional swap-oob (also toggles #generate-btn)"""
+    if count is None:
+        count = count_workspace_items(read_db(), workspace_id)
+    return Label(
+        str(count),
+        cls=LabelT.secondary,
+        id="workspace-items-count",
+        _="init remove @disabled from #generate-btn" if count else "init add @disabled to #generate-btn",
+        hx_swap_oob="true" if swap_oob else "false",
+    )
+
+
+def workspace_items_added(workspace_id: str, items):
+    """OOB updates appending new cards to #ingested-items instead of re-rendering the list"""
+    count = count_workspace_items(read_db(), workspace_id)
+    updates = [
+        Div(*render_input_item_fragments(items, workspace_id), hx_swap_oob="beforeend:#ingested-items"),
+        create_workspace_items_count(workspace_id, count, swap_oob=True),
+    ]
+    if items and count == len(items):
+        # The list was empty, drop its placeholder
+        updates.append(Div(id="ingested-items-empty", hx_swap_oob="delete"))
+    return tuple(updates)
+
+
+def workspace_items_removed(workspace_id: str):
+    """OOB updates after a card was removed: the count, and the placeholder once the list is empty"""
+    count = count_workspace_items(read_db(), workspace_id)
+    updates = [create_workspace_items_count(workspace_id, count, swap_oob=True)]
+    if not count:
+        updates.append(Div(create_workspace_items_empty(), hx_swap_oob="beforeend:#ingested-items"))
+    return tuple(updates)
+
+
 def create_sidebar(user):
     return Div(
         # Quick Actions
@@ -338,6 +501,13 @@ def create_sidebar(user):
                         hx_target="#main-content",
                         cls=(ButtonT.secondary, "w-full justify-start")
                     ),
+                    Button(
+                        UkIcon("search", height=16, width=16, cls="mr-2"),
+                        "Search",
+                        hx_get="/content/search",
+                        hx_target="#main-content",
+                        cls=(ButtonT.secondary, "w-full justify-start")
+                    ),
                     Button(
                         UkIcon("folder", height=16, width=16, cls="mr-2"),
                         "View All Workspaces",
@@ -410,6 +580,30 @@ def create_default_content():
         cls="text-center p-8",
     )
 
+
+def purge_stale_uploads() -> int:
+    """Delete resumable uploads idle for UPLOAD_SESSION_TTL_HOURS, and orphaned .part files"""
+    cutoff = datetime.now() - timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+    stale = upload_sessions(where="updated_at < ?", where_args=[cutoff.isoformat()])
+    for upload in stale:
+        upload_sessions.delete(upload.id)
+        (partial_dir / f"{upload.id}.part").unlink(missing_ok=True)
+    live = {row["id"] for row in db.q("SELECT id FROM upload_session")}
+    for part_path in partial_dir.glob("*.part"):
+        if part_path.stem not in live and datetime.fromtimestamp(part_path.stat().st_mtime) < cutoff:
+            part_path.unlink(missing_ok=True)
+    return len(stale)
+
+
+def purge_expired_entries() -> int:
+    """Delete expired fragment and session rows from the shared SQLite kv store"""
+    purged = 0
+    for backend in (cache_backend, session_backend):
+        if hasattr(backend, "purge_expired"):
+            purged += backend.purge_expired()
+    return purged
+
+
 login_redir = RedirectResponse("/login", status_code=303)
 def user_auth_before(req, session):
     auth = req.scope["auth"] = session.get("auth", None)
@@ -424,23 +618,238 @@ bware = Beforeware(
 
 hdrs = Theme.blue.headers()
 hdrs.append(Script(src="https://unpkg.com/hyperscript.org@0.9.14"))
+hdrs.append(Script(src="https://cdn.jsdelivr.net/npm/htmx-ext-sse@2.2.2/sse.js"))
 hdrs.append(Style(css))
 
 app = FastHTML(
     before=bware,
     hdrs=hdrs,
     pico=False,
-    secret_key="your-secret-key-change-in-production",
+    secret_key=SESSION_SECRET,
+    sess_cls=(
+        SessionMiddleware if SESSION_BACKEND == "cookie"
+        else partial(BackendSessionMiddleware, backend=session_backend)
+    ),
+    on_startup=[ai_client.start, image_detector.start, job_queue.start, purge_stale_uploads, purge_expired_entries],
+    on_shutdown=[job_queue.stop, ai_client.close, detection_pool.shutdown],
 )
 rt = app.route
 
+
+def _transcription_failed(transcription: str) -> bool:
+    return transcription.startswith(("Error", "Transcription failed", "Transcription error"))
+
+
+def needs_transcription(item) -> bool:
+    return item.file_type == "audio" and not item.transcription
+
+
+async def transcribe_input_item(item) -> str:
+    """Return an item's text, transcribing audio that has none yet (RuntimeError on failure)"""
+    transcription = item.transcription or ""
+    if needs_transcription(item):
+        transcription = await transcribe_audio(item.file_path, cache=transcription_cache)
+        if _transcription_failed(transcription):
+            raise RuntimeError(transcription)
+    return transcription
+
+
+def needs_extraction(item, transcription: str) -> bool:
+    return item.file_type in ("audio", "text") and bool(transcription)
+
+
+def save_processed_item(item, transcription: str, entities: dict = None):
+    """Store an item's transcription and extracted entities and mark it processed"""
+    extracted_data = json.dumps(entities) if entities is not None else (item.extracted_data or "")
+    with write_transaction():
+        input_items.update(
+            {
+                "transcription": transcription,
+                "extracted_data": extracted_data,
+                "processed": True,
+            },
+            item.id,
+        )
+        index_item_entities(db, item.id, item.user_id, extracted_data)
+
+
+async def process_input_item(item):
+    """Transcribe and/or extract entities for one input item and save the result.
+
+    Raises RuntimeError when an AI call fails, leaving the item unprocessed so the
+    job queue (or the next /process-items run) can retry it.
+    """
+    transcription = await transcribe_input_item(item)
+    entities = None
+    if needs_extraction(item, transcription):
+        entities = await extract_entities_from_text(transcription, cache=entity_cache)
+        if "error" in entities:
+            raise RuntimeError(entities["error"])
+    await asyncio.to_thread(save_processed_item, item, transcription, entities)
+
+
+async def process_input_items(items: list, concurrency: int = None) -> dict:
+    """Process several input items, extracting entities for their texts in batched calls.
+
+    Stored texts go to extraction right away while audio is transcribed
+    concurrently (bounded by a semaphore); transcribed audio is then extracted in
+    batches of its own. Items with nothing to extract, and each extraction batch,
+    are saved as soon as they complete, so a cancelled request keeps what finished.
+    Returns {item_id: error} for the items left unprocessed.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency or PROCESS_CONCURRENCY))
+    errors = {}
+
+    async def save(item, transcription, entities=None):
+        if entities is not None and "error" in entities:
+            errors[item.id] = entities["error"]
+        else:
+            await asyncio.to_thread(save_processed_item, item, transcription, entities)
+
+    async def extract_batch(batch):
+        extracted = await extract_entities_batch([transcription for _, transcription in batch], cache=entity_cache)
+        for (item, transcription), entities in zip(batch, extracted):
+            await save(item, transcription, entities)
+
+    async def extract(ready):
+        batches = pack_entity_batches([transcription for _, transcription in ready])
+        await asyncio.gather(*(extract_batch([ready[i] for i in batch]) for batch in batches))
+
+    async def transcribe_one(item):
+        try:
+            async with semaphore:
+                transcription = await transcribe_input_item(item)
+        except Exception as e:
+            errors[item.id] = str(e) or e.__class__.__name__
+            return None
+        if needs_extraction(item, transcription):
+            return item, transcription
+        await save(item, transcription)
+
+    async def transcribe_and_extract(audio_items):
+        transcribed = await asyncio.gather(*(transcribe_one(item) for item in audio_items))
+        await extract([ready for ready in transcribed if ready])
+
+    stored_texts = []
+    for item in items:
+        if needs_transcription(item):
+            continue
+        if needs_extraction(item, item.transcription or ""):
+            stored_texts.append((item, item.transcription))
+        else:
+            await save(item, item.transcription or "")
+    await asyncio.gather(
+        extract(stored_texts),
+        transcribe_and_extract([item for item in items if needs_transcription(item)]),
+    )
+    return errors
+
+
+@job_queue.handler("transcribe")
+async def run_input_item_job(job):
+    """Background processing for a freshly uploaded input item"""
+    try:
+        item = get_input_item(read_db(), job.input_item_id)
+    except NotFoundError:
+        return  # Item was deleted while the job was queued
+    if not item.processed:
+        await process_input_item(item)
+
+
+@job_queue.handler("extract", batch_size=ENTITY_BATCH_MAX_ITEMS)
+async def run_extract_jobs(jobs):
+    """Entity extraction for uploaded text items, batched across the queued jobs"""
+    items = {}
+    for job in jobs:
+        try:
+            item = get_input_item(read_db(), job.input_item_id)
+        except NotFoundError:
+            continue  # Item was deleted while the job was queued
+        if not item.processed:
+            items[job.id] = item
+    errors = await process_input_items(list(items.values()))
+    return {job_id: errors[item.id] for job_id, item in items.items() if item.id in errors}
+
+
+@job_queue.handler("thumbnails")
+async def run_thumbnail_job(job):
+    """Pre-generate the resized copies of an uploaded image"""
+    try:
+        item = get_input_item(read_db(), job.input_item_id)
+    except NotFoundError:
+        return
+    if Path(item.file_path).exists():
+        await asyncio.to_thread(generate_derivatives, item.file_path)
+        await asyncio.to_thread(invalidate_item_fragments, item, item.user_id)  # Cached cards lack the srcset
+
+
+@rt("/metrics/jobs")
+def job_metrics():
+    """Background job queue counters"""
+    return job_queue.stats()
+
+@rt("/metrics/ai-client")
+def ai_client_metrics():
+    """Connection pool metrics for the shared AI service client"""
+    return ai_client.metrics()
+
+@rt("/metrics/detection")
+def detection_metrics():
+    """Image detection thread pool queueing and detector service counters"""
+    return {"pool": detection_pool.metrics(), "detector": image_detector.metrics()}
+
+@rt("/metrics/reports")
+def report_metrics_route():
+    """Report generation mode counts, prompt token estimates and latencies"""
+    return report_metrics.metrics()
+
+@rt("/metrics/caches")
+def cache_metrics():
+    """Hit/miss counters and sizes of the AI result caches"""
+    return {
+        "transcriptions": transcription_cache.stats(),
+        "entities": entity_cache.stats(),
+        "fragments": fragment_cache.stats(),
+        "workspace_summaries": workspace_summaries.stats(),
+    }
+
+# Stored uploads and their derivatives are named by UUID and never rewritten in place
+IMMUTABLE_UPLOAD_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}(\.(thumb|medium))?\.\w+$")
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def upload_etag(stat) -> str:
+    return f'"{stat.st_ino:x}-{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored"""
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
 # Serve uploaded files
 @rt("/uploads/{file_type}/{filename}")
-def serve_file(file_type: str, filename: str):
+def serve_file(file_type: str, filename: str, request: Request):
     file_path = upload_dir / file_type / filename
-    if file_path.exists():
-        return FileResponse(file_path)
-    return "Not found", 404
+    if not file_path.is_file():
+        # Image derivatives missing on disk (older uploads, or a replaced original) are built on first request
+        derived = resolve_derivative(upload_dir / "images", filename) if file_type == "images" else None
+        if not derived:
+            return "Not found", 404
+        file_path = derived
+
+    stat = file_path.stat()
+    headers = {
+        "ETag": upload_etag(stat),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if IMMUTABLE_UPLOAD_RE.match(filename) else "no-cache",
+    }
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    # FileResponse answers Range/If-Range requests with 206 (single or multipart ranges) itself
+    return FileResponse(file_path, headers=headers, stat_result=stat)
 
 @rt
 def index(session):
@@ -459,7 +868,7 @@ def index(session):
                 ),
         )))
 
-    user = users[auth]
+    user = get_user(read_db(), auth)
     return Title("Maintenance Report Generator"), Container(
         # Mobile sidebar tab - positioned as a tab on the left edge
         Button(
@@ -517,7 +926,11 @@ def login():
 @rt
 def send_login(username: str, password: str, session):
     try:
-        user = users(where=f"username = '{username}' AND active = 1")[0]
+        user = find_active_user(read_db(), username)
+        if user is None:
+            return Div(
+                "Invalid username or password", cls=TextT.error
+            )
         print(f"User found: {user.username}")
         if verify_password(password, user.password_hash):
             session["auth"] = user.id
@@ -582,9 +995,7 @@ def register():
 def post(username: str, email: str, password: str, session):
     try:
         # Check if username already exists
-        existing_users = users(where=f"username = '{username}' OR email = '{email}'")
-
-        if existing_users:
+        if username_or_email_taken(read_db(), username, email):
             return Div(
                 "Username or email already exists",
                 cls=TextT.error,
@@ -617,31 +1028,25 @@ def post(username: str, email: str, password: str, session):
         )
 
 
-@rt("/upload")
-async def upload_file(request, session):
-    """Handle file uploads via drag-and-drop or file input"""
-    auth = session.get("auth")
-    form = await request.form()
-    files = form.getlist("files")
-    workspace_id = form.get("workspace_id", generate_uuid())
-    user = users[auth]
-    print(f"Upload called with workspace_id: {workspace_id}, files: {len(files) if files else 0}")
-    print(f"Form keys: {list(form.keys())}")
-    if files:
-        print(f"First file type: {type(files[0])}")
-        if hasattr(files[0], 'filename'):
-            print(f"First file: filename={files[0].filename}, content_type={files[0].content_type}")
-        else:
-            print(f"First file value: {files[0]}")
+def classify_upload(filename: str, content_type: str):
+    """Map an uploaded file to its file_type and storage directory"""
+    # Handle webm recordings and other audio types
+    if content_type.startswith("audio/") or filename.endswith(('.webm', '.m4a')):
+        return "audio", upload_dir / "audio"
+    if content_type.startswith("image/"):
+        return "image", upload_dir / "images"
+    return "text", upload_dir / "text"
 
-    # Create workspace if it doesn't exist
+
+def ensure_workspace(workspace_id: str, user_id: int):
+    """Return the workspace, creating a draft one if it doesn't exist yet"""
     try:
-        workspace = workspaces[workspace_id]
+        return workspaces[workspace_id]
     except:
-        workspace = workspaces.insert(
+        return workspaces.insert(
             Workspace(
                 id=workspace_id,
-                user_id=user.id,
+                user_id=user_id,
                 name=f"Workspace {datetime.now().strftime('%Y-%m-%d %H:%M')}",
                 created_at=get_current_timestamp(),
                 updated_at=get_current_timestamp(),
@@ -649,120 +1054,266 @@ async def upload_file(request, session):
             )
         )
 
-    uploaded_items = []
+
+async def register_upload(user_id: int, workspace_id: str, original_filename: str, mime_type: str,
+                          file_type: str, storage_path: Path, file_size: int, content_hash: str) -> str:
+    """Insert the input item for a stored file, link it to the workspace and queue its AI job"""
+    item_id = generate_uuid()
+
+    # Store text content with the row; AI work runs in the background job queue
+    transcription = ""
+    if file_type == "text":
+        try:
+            async with aiofiles.open(storage_path, "r") as f:
+                transcription = await f.read()
+        except Exception as e:
+            transcription = f"Error reading file: {str(e)}"
+
+    item = InputItem(
+        id=item_id,
+        user_id=user_id,
+        filename=storage_path.name,
+        original_filename=original_filename,
+        file_path=str(storage_path),
+        file_type=file_type,
+        mime_type=mime_type,
+        file_size=file_size,
+        uploaded_at=get_current_timestamp(),
+        processed=False,
+        transcription=transcription,
+        extracted_data="",
+        content_hash=content_hash,
+    )
+    await asyncio.to_thread(insert_uploaded_item, item, workspace_id)
+    return item_id
+
+
+def insert_uploaded_item(item: InputItem, workspace_id: str):
+    """Insert a new input item, link it to its workspace and queue its AI job, in one transaction"""
+    with write_transaction():
+        input_items.insert(item)
+        add_workspace_item(db, workspace_id, item.id)
+
+        if item.file_type == "audio":
+            job_queue.enqueue("transcribe", item.id, item.user_id)
+        elif item.file_type == "text" and not item.transcription.startswith("Error reading file"):
+            job_queue.enqueue("extract", item.id, item.user_id)
+        elif item.file_type == "image":
+            job_queue.enqueue("thumbnails", item.id, item.user_id)
+
+
+def upload_response(user_id: int, workspace_id: str, item_ids: list):
+    """Out-of-band updates sent back after files are added to a workspace"""
+    recent_uploads_update = create_recent_uploads_section(user_id, swap_oob=True)
+    workspace_input = Input(type="hidden", id="current-workspace-id", value=workspace_id, hx_swap_oob="true")
+    new_items = get_input_items(read_db(), item_ids)
+    return (*workspace_items_added(workspace_id, new_items), recent_uploads_update, workspace_input)
+
+
+@rt("/upload")
+async def upload_file(request, session):
+    """Handle file uploads via drag-and-drop or file input
+
+    Starlette spools multipart files to temporary files while parsing, and each
+    file is copied to storage in UPLOAD_CHUNK_SIZE pieces (hashed on the way),
+    so memory use stays flat regardless of the upload size.
+    """
+    auth = session.get("auth")
+    form = await request.form()
+    files = form.getlist("files")
+    workspace_id = form.get("workspace_id", generate_uuid())
+    user = get_user(read_db(), auth)
+    print(f"Upload called with workspace_id: {workspace_id}, files: {len(files) if files else 0}")
+
+    ensure_workspace(workspace_id, user.id)
+
+    item_ids = []
     for file in files:
         print(f"Processing file: {file.filename}, content_type: {file.content_type}")
         if file.filename:
-            file_ext = Path(file.filename).suffix
-            unique_filename = f"{generate_uuid()}{file_ext}"
-
-            # Handle webm recordings and other audio types
-            if file.content_type.startswith("audio/") or file.filename.endswith(('.webm', '.m4a')):
-                file_type = "audio"
-                storage_path = upload_dir / "audio" / unique_filename
-            elif file.content_type.startswith("image/"):
-                file_type = "image"
-                storage_path = upload_dir / "images" / unique_filename
-            else:
-                file_type = "text"
-                storage_path = upload_dir / "text" / unique_filename
+            file_type, storage_dir = classify_upload(file.filename, file.content_type)
+            storage_path = storage_dir / f"{generate_uuid()}{Path(file.filename).suffix}"
+            file_size, content_hash = await stream_to_file(iter_upload_chunks(file, UPLOAD_CHUNK_SIZE), storage_path)
+            item_ids.append(await register_upload(user.id, workspace_id, file.filename, file.content_type,
+                                                  file_type, storage_path, file_size, content_hash))
 
-            content = await file.read()
-            async with aiofiles.open(storage_path, "wb") as f:
-                await f.write(content)
+    return upload_response(user.id, workspace_id, item_ids)
 
-            item_id = generate_uuid()
-            
-            # Process text files immediately during upload
-            transcription = ""
-            extracted_data = ""
-            processed = False
-            
-            if file_type == "text":
-                try:
-                    # Read text content immediately
-                    async with aiofiles.open(storage_path, "r") as f:
-                        text_content = await f.read()
-                    transcription = text_content
-                    extracted_data = json.dumps(
-                        await extract_entities_from_text(text_content)
-                    )
-                    processed = True
-                except Exception as e:
-                    transcription = f"Error reading file: {str(e)}"
-                    processed = False
-            
-            input_items.insert(
-                InputItem(
-                    id=item_id,
-                    user_id=user.id,
-                    filename=unique_filename,
-                    original_filename=file.filename,
-                    file_path=str(storage_path),
-                    file_type=file_type,
-                    mime_type=file.content_type,
-                    file_size=len(content),
-                    uploaded_at=get_current_timestamp(),
-                    processed=processed,
-                    transcription=transcription,
-                    extracted_data=extracted_data,
-                )
-            )
-            
-            current_item_ids = json.loads(workspace.input_item_ids or "[]")
-            current_item_ids.append(item_id)
-            workspaces.update({"input_item_ids": json.dumps(current_item_ids)}, workspace_id)
-
-            uploaded_items.append(
-                {
-                    "id": item_id,
-                    "filename": file.filename,
-                    "type": file_type,
-                    "size": len(content),
-                }
-            )
 
-    recent_uploads_update = create_recent_uploads_section(user.id, swap_oob=True)
-    
-    # Get all current workspace items to rebuild the ingested-items div
-    updated_workspace = workspaces[workspace_id]
-    all_item_ids = json.loads(updated_workspace.input_item_ids or "[]")
-    all_items = []
-    if all_item_ids:
-        item_ids_str = "', '".join(all_item_ids)
-        all_items = input_items(where=f"id IN ('{item_ids_str}')")
-    
-    # Rebuild the entire ingested-items div with all items using unified fragment
-    items_content = []
-    for workspace_item in all_items:
-        items_content.append(build_input_item_fragment(workspace_item, workspace_id))
-    
-    # Create the updated ingested-items div
-    updated_ingested_items = Div(
-        *items_content if items_content else [P("No items added yet.", cls=(TextPresets.muted_sm, "italic"))],
-        id="ingested-items",
-        _="on load or htmx:afterSwap if .input-item-article in me then remove @disabled from #generate-btn else add @disabled to #generate-btn",
-        hx_swap_oob="true"
+# Resumable chunked uploads: init -> PUT chunks at the server's offset -> complete
+def _upload_session_status(upload):
+    part_path = partial_dir / f"{upload.id}.part"
+    received = part_path.stat().st_size if part_path.exists() else 0
+    return {"upload_id": upload.id, "received": received, "total_size": upload.total_size,
+            "chunk_size": UPLOAD_CHUNK_SIZE}
+
+
+def _get_upload_session(upload_id: str, user_id: int):
+    try:
+        upload = upload_sessions[upload_id]
+    except NotFoundError:
+        return None
+    return upload if upload.user_id == user_id else None
+
+
+# Upload ids with a chunk being appended by this process
+_chunk_writers = set()
+
+
+@contextmanager
+def _chunk_lock(upload_id: str):
+    """Hold the right to append to an upload; yields False while another request is writing to it.
+
+    The set covers requests on this worker, an exclusive flock on the .part file
+    covers other worker processes.
+    """
+    if upload_id in _chunk_writers:
+        yield False
+        return
+    _chunk_writers.add(upload_id)
+    try:
+        with open(partial_dir / f"{upload_id}.part", "rb") as part_file:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(part_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    yield False
+                    return
+            yield True
+    finally:
+        _chunk_writers.discard(upload_id)
+
+
+async def _limit_stream(chunks, limit: int):
+    """Pass chunks through, raising ValueError once more than `limit` bytes have arrived"""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > limit:
+            raise ValueError("Chunk exceeds the allowed size")
+        yield chunk
+
+
+@rt("/upload/resumable", methods=["POST"])
+def init_resumable_upload(session, filename: str, total_size: int, workspace_id: str = None, content_type: str = ""):
+    """Start a resumable upload and return its id and the chunk size to use"""
+    auth = session.get("auth")
+    workspace_id = workspace_id or generate_uuid()
+    if ensure_workspace(workspace_id, auth).user_id != auth:
+        return JSONResponse({"error": "Workspace not found"}, status_code=404)
+    purge_stale_uploads()
+    upload = upload_sessions.insert(
+        UploadSession(
+            id=generate_uuid(),
+            user_id=auth,
+            workspace_id=workspace_id,
+            original_filename=filename,
+            mime_type=content_type or "application/octet-stream",
+            total_size=total_size,
+            created_at=get_current_timestamp(),
+            updated_at=get_current_timestamp(),
+        )
     )
-    
-    workspace_input = Input(type="hidden", id="current-workspace-id", value=workspace_id, hx_swap_oob="true")
-    
-    return updated_ingested_items, recent_uploads_update, workspace_input
+    (partial_dir / f"{upload.id}.part").touch()
+    return _upload_session_status(upload)
+
+
+@rt("/upload/resumable/{upload_id}", methods=["GET"])
+def resumable_upload_status(upload_id: str, session):
+    """Report how many bytes of a resumable upload the server already has"""
+    upload = _get_upload_session(upload_id, session.get("auth"))
+    if upload is None:
+        return JSONResponse({"error": "Upload not found"}, status_code=404)
+    return _upload_session_status(upload)
+
+
+@rt("/upload/resumable/{upload_id}", methods=["PUT"])
+async def put_resumable_chunk(upload_id: str, offset: int, session, request):
+    """Append the request body to a resumable upload at the given byte offset.
+
+    A chunk whose offset doesn't match what the server holds, or that arrives
+    while another chunk of the same upload is being written, is rejected with 409
+    and the current status, so the client can resume from the right place.
+    Chunks are capped at UPLOAD_CHUNK_SIZE and at the bytes still expected (413).
+    """
+    upload = _get_upload_session(upload_id, session.get("auth"))
+    if upload is None or not (partial_dir / f"{upload.id}.part").exists():
+        return JSONResponse({"error": "Upload not found"}, status_code=404)
+
+    with _chunk_lock(upload.id) as locked:
+        status = _upload_session_status(upload)
+        if not locked:
+            return JSONResponse({"error": "Another chunk is being written", **status}, status_code=409)
+        if offset != status["received"]:
+            return JSONResponse({"error": "Offset mismatch", **status}, status_code=409)
+        limit = min(UPLOAD_CHUNK_SIZE, upload.total_size - offset)
+        declared = request.headers.get("content-length", "")
+        if declared.isdigit() and int(declared) > limit:
+            return JSONResponse({"error": "Chunk too large", **status}, status_code=413)
+
+        part_path = partial_dir / f"{upload.id}.part"
+        try:
+            await stream_to_file(_limit_stream(request.stream(), limit), part_path, mode="ab")
+        except ValueError:
+            os.truncate(part_path, offset)
+            return JSONResponse({"error": "Chunk too large", **_upload_session_status(upload)}, status_code=413)
+        upload_sessions.update({"updated_at": get_current_timestamp()}, upload.id)
+        return _upload_session_status(upload)
+
+
+@rt("/upload/resumable/{upload_id}/complete", methods=["POST"])
+async def complete_resumable_upload(upload_id: str, session):
+    """Move a fully received upload into storage and add it to its workspace.
+
+    Holds the chunk lock while hashing and moving the file, so a chunk still being
+    written or a second completion request gets 409; once the .part file is gone
+    (already completed or purged) the upload is 404.
+    """
+    auth = session.get("auth")
+    upload = _get_upload_session(upload_id, auth)
+    if upload is None or not (partial_dir / f"{upload.id}.part").exists():
+        return JSONResponse({"error": "Upload not found"}, status_code=404)
+
+    file_type, storage_dir = classify_upload(upload.original_filename, upload.mime_type)
+    storage_path = storage_dir / f"{generate_uuid()}{Path(upload.original_filename).suffix}"
+    part_path = partial_dir / f"{upload.id}.part"
+    try:
+        with _chunk_lock(upload.id) as locked:
+            status = _upload_session_status(upload)
+            if not locked:
+                return JSONResponse({"error": "Upload is busy", **status}, status_code=409)
+            if status["received"] != upload.total_size:
+                return JSONResponse({"error": "Upload incomplete", **status}, status_code=409)
+            content_hash = await asyncio.to_thread(file_sha256, part_path)
+            os.replace(part_path, storage_path)
+            await asyncio.to_thread(upload_sessions.delete, upload.id)
+    except FileNotFoundError:
+        return JSONResponse({"error": "Upload not found"}, status_code=404)
+
+    item_id = await register_upload(auth, upload.workspace_id, upload.original_filename, upload.mime_type,
+                                    file_type, storage_path, upload.total_size, content_hash)
+    return upload_response(auth, upload.workspace_id, [item_id])
+
+
+@rt("/input-item-card/{item_id}")
+def input_item_card(item_id: str, session, workspace_id: str = None):
+    """Re-render one input item card (polled while its background job runs)"""
+    auth = session.get("auth")
+    try:
+        item = get_input_item(read_db(), item_id)
+    except NotFoundError:
+        return ""  # Deleted while polling: the outerHTML swap removes the card
+    if item.user_id != auth:
+        return Alert("Unauthorized", cls=AlertT.error)
+    return render_input_item_fragments([item], workspace_id)[0]
 
 
 @rt("/workspace/{workspace_id}/items")
 def get_workspace_items(workspace_id: str, session):
     """Get all items for a workspace"""
     auth = session.get("auth")
-    user = users[auth]
-    workspace = workspaces[workspace_id]
-    item_ids = json.loads(workspace.input_item_ids or "[]")
-    
-    if not item_ids:
-        items = []
-    else:
-        item_ids_str = "', '".join(item_ids)
-        items = input_items(where=f"id IN ('{item_ids_str}')")
+    user = get_user(read_db(), auth)
+    items = list_workspace_items(read_db(), workspace_id)
 
     items_html = ""
     for item in items:
@@ -789,62 +1340,120 @@ def get_workspace_items(workspace_id: str, session):
 
 @rt("/process-items")
 async def process_items(workspace_id: str, session):
-    """Process workspace items with AI (transcription and entity extraction)"""
+    """Process workspace items with AI (transcription and entity extraction)
+
+    Unprocessed items go through process_input_items: audio is transcribed
+    concurrently, short texts share batched extraction calls, and every item that
+    succeeds is saved even when others fail. Items with a queued or running
+    background job are left to that job, and waited for, rather than processed twice.
+    """
     auth = session.get("auth")
-    user = users[auth]
-    workspace = workspaces[workspace_id]
-    item_ids = json.loads(workspace.input_item_ids or "[]")
-    
-    if not item_ids:
-        items = []
-    else:
-        item_ids_str = "', '".join(item_ids)
-        items = input_items(where=f"id IN ('{item_ids_str}')")
+    user = get_user(read_db(), auth)
+    items = list_workspace_items(read_db(), workspace_id)
 
     if not items:
         return {"error": "No items found"}
 
-    processed_count = 0
-    for item in items:
-        if not item.processed:
-            transcription = ""
-            extracted_data = ""
-
-            # Process audio files (text files are processed during upload)
-            if item.file_type == "audio":
-                transcription = await transcribe_audio(item.file_path)
-                if transcription and not transcription.startswith("Error"):
-                    extracted_data = json.dumps(
-                        await extract_entities_from_text(transcription)
-                    )
+    unprocessed = [item for item in items if not item.processed]
+    active = job_queue.active_item_ids([item.id for item in unprocessed])
+    pending = [item for item in unprocessed if item.id not in active]
+    errors = await process_input_items(pending)
+    still_running = await job_queue.wait_for_items(list(active))
+
+    failed = []
+    for item_id, error in errors.items():
+        print(f"Failed to process item {item_id}: {error}")
+        failed.append(item_id)
+
+    return {
+        "success": not failed,
+        "processed": len(pending) - len(failed),
+        "failed": failed,
+        "in_background": len(still_running),
+        "total": len(items),
+    }
 
-            # Update item in database
-            input_items.update(
-                {
-                    "transcription": transcription,
-                    "extracted_data": extracted_data,
-                    "processed": True,
-                },
-                item.id,
-            )
-            processed_count += 1
 
-    return {"success": True, "processed": processed_count}
+def workspace_items_data(workspace_id: str) -> list:
+    """Collect the workspace item fields sent to the report generator"""
+    return [
+        {
+            "id": item.id,
+            "filename": item.original_filename,
+            "type": item.file_type,
+            "transcription": item.transcription,
+            "extracted_data": item.extracted_data,
+        }
+        for item in list_workspace_items(read_db(), workspace_id)
+    ]
+
+
+async def generate_workspace_report(workspace_id: str) -> dict:
+    """Generate a workspace's report, sending only the notes changed since the last one"""
+    plan = await asyncio.to_thread(workspace_summaries.plan, workspace_id, workspace_items_data(workspace_id))
+    if plan["mode"] == "reuse":
+        return plan["previous_report"]
+    report_data = await generate_maintenance_report(plan["items"], previous_report=plan["previous_report"])
+    if "error" not in report_data:
+        await asyncio.to_thread(workspace_summaries.store, workspace_id, plan["digests"], report_data)
+    return report_data
+
+
+async def stream_workspace_report(workspace_id: str):
+    """stream_maintenance_report for a workspace, incremental like generate_workspace_report"""
+    plan = await asyncio.to_thread(workspace_summaries.plan, workspace_id, workspace_items_data(workspace_id))
+    if plan["mode"] == "reuse":
+        report = plan["previous_report"]
+        yield {"fields": {k: v for k, v in report.items() if k in REPORT_STRING_FIELDS + REPORT_LIST_FIELDS}}
+        yield {"report": report}
+        return
+    async for update in stream_maintenance_report(plan["items"], previous_report=plan["previous_report"]):
+        if "report" in update:
+            await asyncio.to_thread(workspace_summaries.store, workspace_id, plan["digests"], update["report"])
+        yield update
+
+
+def save_generated_report(workspace_id: str, user_id: int, report_data: dict) -> str:
+    """Persist a generated report as an open MaintenanceReport and return its id"""
+    report_id = generate_uuid()
+    report = MaintenanceReport(
+        id=report_id,
+        workspace_id=workspace_id,
+        user_id=user_id,
+        title=report_data.get("title", "Generated Maintenance Report"),
+        description=report_data.get("description", ""),
+        equipment_id=report_data.get("equipment_id", ""),
+        part_numbers=json.dumps(report_data.get("part_numbers", [])),
+        defect_codes=json.dumps(report_data.get("defect_codes", [])),
+        corrective_action=report_data.get("corrective_action", ""),
+        parts_used=json.dumps(report_data.get("parts_used", [])),
+        next_service_date=report_data.get("next_service_date", ""),
+        priority=report_data.get("priority", "medium"),
+        status="open",
+        created_at=get_current_timestamp(),
+        updated_at=get_current_timestamp(),
+        finalized=False,
+    )
+    with write_transaction():
+        maintenance_reports.insert(report)
+        index_report_entities(db, report_id, user_id, report)
+    return report_id
+
+
+def save_report_updates(report_id: str, updates: dict):
+    """Apply edited report fields and re-index the report's entity references"""
+    with write_transaction():
+        report = maintenance_reports.update(updates, report_id)
+        index_report_entities(db, report_id, report.user_id, updates)
+    return report
 
 
 @rt("/generate-report")
 async def generate_report(workspace_id: str, session):
     """Generate a maintenance report from workspace items"""
     auth = session.get("auth")
-    user = users[auth]
-    workspace = workspaces[workspace_id]
-    item_ids = json.loads(workspace.input_item_ids or "[]")
-    
-    if not item_ids:
-        items = []
-    else:
-        item_ids_str = "', '".join(item_ids)
-        items = input_items(where=f"id IN ('{item_ids_str}')")
+    user = get_user(read_db(), auth)
+    items = list_workspace_items(read_db(), workspace_id)
 
     if not items:
         return Div(
@@ -854,27 +1463,7 @@ async def generate_report(workspace_id: str, session):
 
     await process_items(workspace_id, session)
 
-    workspace = workspaces[workspace_id]
-    item_ids = json.loads(workspace.input_item_ids or "[]")
-    
-    if not item_ids:
-        items = []
-    else:
-        item_ids_str = "', '".join(item_ids)
-        items = input_items(where=f"id IN ('{item_ids_str}')")
-
-    items_data = []
-    for item in items:
-        items_data.append(
-            {
-                "filename": item.original_filename,
-                "type": item.file_type,
-                "transcription": item.transcription,
-                "extracted_data": item.extracted_data,
-            }
-        )
-
-    report_data = await generate_maintenance_report(items_data)
+    report_data = await generate_workspace_report(workspace_id)
 
     if "error" in report_data:
         return Div(
@@ -883,27 +1472,7 @@ async def generate_report(workspace_id: str, session):
             cls="p-8 border border-red-500 rounded-lg mt-8 bg-red-50",
         )
 
-    report_id = generate_uuid()
-    maintenance_reports.insert(
-        MaintenanceReport(
-            id=report_id,
-            workspace_id=workspace_id,
-            user_id=user.id,
-            title=report_data.get("title", "Generated Maintenance Report"),
-            description=report_data.get("description", ""),
-            equipment_id=report_data.get("equipment_id", ""),
-            part_numbers=json.dumps(report_data.get("part_numbers", [])),
-            defect_codes=json.dumps(report_data.get("defect_codes", [])),
-            corrective_action=report_data.get("corrective_action", ""),
-            parts_used=json.dumps(report_data.get("parts_used", [])),
-            next_service_date=report_data.get("next_service_date", ""),
-            priority=report_data.get("priority", "medium"),
-            status="open",
-            created_at=get_current_timestamp(),
-            updated_at=get_current_timestamp(),
-            finalized=False,
-        )
-    )
+    report_id = await asyncio.to_thread(save_generated_report, workspace_id, user.id, report_data)
 
     return Div(
         H3("Generated Maintenance Report"),
@@ -947,7 +1516,7 @@ async def generate_report(workspace_id: str, session):
 def content_workspace(session, workspace_id: str = None):
     """Return workspace content fragment - creates new or loads existing workspace"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
 
     if workspace_id is None:
         # Create a new workspace
@@ -968,7 +1537,7 @@ def content_workspace(session, workspace_id: str = None):
     else:
         # Load existing workspace
         try:
-            workspace = workspaces[workspace_id]
+            workspace = get_workspace(read_db(), workspace_id)
             if workspace.user_id != user.id:
                 return Alert("Unauthorized access to workspace", cls=AlertT.error)
             workspace_name = workspace.name
@@ -976,17 +1545,11 @@ def content_workspace(session, workspace_id: str = None):
             return Alert("Workspace not found", cls=AlertT.error)
 
     # Get workspace items if any
-    workspace = workspaces[workspace_id]
-    item_ids = json.loads(workspace.input_item_ids or "[]")
-    items = []
-    if item_ids:
-        item_ids_str = "', '".join(item_ids)
-        items = input_items(where=f"id IN ('{item_ids_str}')")
+    workspace = get_workspace(read_db(), workspace_id)
+    items = list_workspace_items(read_db(), workspace_id)
 
     # Create items display using unified fragment
-    items_content = []
-    for item in items:
-        items_content.append(build_input_item_fragment(item, workspace_id))
+    items_content = render_input_item_fragments(items, workspace_id)
 
     return Container(
         # Workspace Header Card
@@ -1056,8 +1619,7 @@ def content_workspace(session, workspace_id: str = None):
                 Form(
                     hx_encoding="multipart/form-data",
                     hx_post="/upload",
-                    hx_target="#ingested-items",
-                    hx_swap="outerHTML",
+                    hx_swap="none",
                     _="on htmx:xhr:progress(loaded, total) set #upload-progress.value to (loaded/total)*100 on htmx:configRequest(detail) if #current-workspace-id then set detail.parameters.workspace_id to #current-workspace-id.value end"
                 )(
                     UploadZone(
@@ -1092,6 +1654,48 @@ def content_workspace(session, workspace_id: str = None):
             window.status = document.getElementById('recording-status');
             window.workspaceId = '{workspace_id}';
 
+            async function uploadResumable(blob, filename, workspaceId) {{
+                const initResponse = await fetch('/upload/resumable', {{
+                    method: 'POST',
+                    body: new URLSearchParams({{ filename: filename, content_type: blob.type, total_size: blob.size, workspace_id: workspaceId }})
+                }});
+                const init = await initResponse.json().catch(() => ({{}}));
+                if (!initResponse.ok) throw new Error(init.error || `Upload failed (${{initResponse.status}})`);
+
+                // The server reports how much it holds after every chunk (and on 409), so resume from there
+                let offset = init.received;
+                let failures = 0;
+                const retry = async err => {{
+                    if (++failures > 5) throw err;
+                    await new Promise(resolve => setTimeout(resolve, 1000 * failures));
+                }};
+                while (offset < blob.size) {{
+                    let response;
+                    try {{
+                        response = await fetch(`/upload/resumable/${{init.upload_id}}?offset=${{offset}}`, {{
+                            method: 'PUT',
+                            body: blob.slice(offset, offset + init.chunk_size)
+                        }});
+                    }} catch (err) {{
+                        await retry(err);
+                        continue;
+                    }}
+                    const status = await response.json().catch(() => ({{}}));
+                    const error = new Error(status.error || `Upload failed (${{response.status}})`);
+                    // Server errors are retried; any other error response (404, 413...) aborts the upload
+                    if (response.status >= 500) {{
+                        await retry(error);
+                        continue;
+                    }}
+                    if ((!response.ok && response.status !== 409) || typeof status.received !== 'number') throw error;
+                    offset = status.received;
+                    failures = 0;
+                }}
+                const complete = await fetch(`/upload/resumable/${{init.upload_id}}/complete`, {{ method: 'POST' }});
+                if (!complete.ok) throw new Error(`Upload failed (${{complete.status}})`);
+                return complete.text();
+            }}
+
             async function startRecording() {{
                 try {{
                     const stream = await navigator.mediaDevices.getUserMedia({{ audio: true }});
@@ -1132,29 +1736,34 @@ def content_workspace(session, workspace_id: str = None):
                         }}, {{ once: true }});
                         window.audioElement.load();
 
-                        // Upload via existing route
-                        const formData = new FormData();
-                        formData.append('files', audioBlob, `recording-${{Date.now()}}.` + fileExtension);
-                        formData.append('workspace_id', window.recordingWorkspaceId);
-
-                        fetch('/upload', {{
-                            method: 'POST',
-                            body: formData
-                        }})
-                        .then(response => response.text())
+                        // Upload in resumable chunks so flaky connections don't restart the whole recording
+                        uploadResumable(audioBlob, `recording-${{Date.now()}}.` + fileExtension, window.recordingWorkspaceId)
                         .then(html => {{
                             // Process out-of-band swaps manually
                             const parser = new DOMParser();
                             const doc = parser.parseFromString(html, 'text/html');
+                            const processNode = node => {{
+                                htmx.process(node);
+                                if (window._hyperscript) _hyperscript.processNode(node);
+                            }};
                             doc.querySelectorAll('[hx-swap-oob], [data-hx-swap-oob]').forEach(el => {{
                                 const oobValue = el.getAttribute('hx-swap-oob') || el.getAttribute('data-hx-swap-oob');
-                                // Assuming default OOB behavior: replace element with matching ID
-                                const targetId = (oobValue === 'true' || !oobValue.includes(':')) ? el.id : oobValue.split(':')[1];
-                                const target = document.getElementById(targetId);
-                                if (target) {{
-                                    target.outerHTML = el.outerHTML;
-                                    const newTarget = document.getElementById(targetId);
-                                    if (newTarget) htmx.process(newTarget);
+                                const [style, selector] = oobValue.includes(':') ? oobValue.split(/:(.*)/s) : [oobValue, '#' + el.id];
+                                const target = document.querySelector(selector);
+                                if (!target) return;
+                                if (style === 'delete') {{
+                                    target.remove();
+                                }} else if (style === 'beforeend') {{
+                                    // Append the wrapper's children, as htmx does for non-outerHTML swaps
+                                    Array.from(el.children).forEach(child => {{
+                                        target.appendChild(child);
+                                        processNode(child);
+                                    }});
+                                }} else {{
+                                    // Default OOB behavior: replace element with matching ID
+                                    el.removeAttribute('hx-swap-oob');
+                                    target.replaceWith(el);
+                                    processNode(el);
                                 }}
                             }});
                         }})
@@ -1210,7 +1819,11 @@ def content_workspace(session, workspace_id: str = None):
         Card(
             CardHeader(
                 DivFullySpaced(
-                    DivLAligned(UkIcon("file-text", height=20, width=20), H4("Workspace Items")),
+                    DivLAligned(
+                        UkIcon("file-text", height=20, width=20), H4("Workspace Items"),
+                        create_workspace_items_count(workspace_id, len(items_content)),
+                        cls="space-x-2"
+                    ),
                     Button(
                         UkIcon("plus", height=16, width=16, cls="mr-2"),
                         "Add Existing Item",
@@ -1222,16 +1835,7 @@ def content_workspace(session, workspace_id: str = None):
             ),
             CardBody(
                 Div(
-                    *items_content if items_content else [
-                        Center(
-                            DivVStacked(
-                                UkIcon("inbox", height=48, width=48, cls="mx-auto text-muted-foreground mb-4"),
-                                P("No items added yet", cls=TextT.medium),
-                                P("Upload files or add existing items to get started", cls=TextPresets.muted_sm),
-                                cls="text-center py-8"
-                            )
-                        )
-                    ],
+                    *items_content if items_content else [create_workspace_items_empty()],
                     id="ingested-items",
                     _="on htmx:afterSwap if .input-item-article in me then remove @disabled from #generate-btn else add @disabled to #generate-btn"
                 )
@@ -1251,6 +1855,7 @@ def content_workspace(session, workspace_id: str = None):
                         UkIcon("zap", height=16, width=16, cls="mr-2"),
                         "Generate Report",
                         hx_post="/content/generate-report",
+                        hx_vals={"stream": "true"},
                         hx_target="#main-content",
                         cls=(ButtonT.primary, "w-full"),
                         id="generate-btn",
@@ -1271,18 +1876,15 @@ def content_workspace(session, workspace_id: str = None):
 def modal_add_input(workspace_id: str, session):
     """Return modal for adding existing input items to workspace"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     # Get workspace and its current items
-    workspace = workspaces[workspace_id]
+    workspace = get_workspace(read_db(), workspace_id)
     if workspace.user_id != user.id:
         return Alert("Unauthorized", cls=AlertT.error)
     
-    current_item_ids = json.loads(workspace.input_item_ids or "[]")
-    
     # Get all user input items not already in this workspace
-    all_user_items = input_items(where=f"user_id = {user.id}")
-    available_items = [item for item in all_user_items if item.id not in current_item_ids]
+    available_items = list_items_not_in_workspace(read_db(), user.id, workspace_id)
     
     modal_items = []
     for item in available_items:
@@ -1332,11 +1934,11 @@ def modal_close():
 def modal_edit_transcription(item_id: str, session):
     """Return modal for editing transcription or text content"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
         # Verify item ownership
-        item = input_items[item_id]
+        item = get_input_item(read_db(), item_id)
         if item.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
@@ -1380,31 +1982,27 @@ def modal_edit_transcription(item_id: str, session):
 def update_transcription(item_id: str, session, transcription: str):
     """Update transcription or text content for an input item"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
         # Verify item ownership
-        item = input_items[item_id]
+        item = get_input_item(read_db(), item_id)
         if item.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
         # Update the transcription
+        invalidate_item_fragments(item, user.id)
         input_items.update({"transcription": transcription}, item_id)
         
         # Create out-of-band update with proper workspace context
         updated_item = input_items[item_id]
         
         # Find which workspace this item belongs to for the current user
-        workspace_id = None
-        user_workspaces = workspaces(where=f"user_id = {user.id}")
-        for workspace in user_workspaces:
-            item_ids = json.loads(workspace.input_item_ids or "[]")
-            if item_id in item_ids:
-                workspace_id = workspace.id
-                break
+        item_workspaces = item_workspace_ids(read_db(), item_id, user.id)
+        workspace_id = item_workspaces[0] if item_workspaces else None
         
         # Create fragment with correct workspace context to match existing DOM structure  
-        article = build_input_item_fragment(updated_item, workspace_id)
+        article = build_input_item_fragment(updated_item, workspace_id, pending=item_pending(updated_item))
         
         # Set OOB swap attribute properly - recreate article with hx_swap_oob in constructor
         updated_article = Article(
@@ -1450,11 +2048,11 @@ def update_description(item_id: str, session, description: str = ""):
 def _update_extracted_field_helper(item_id: str, field: str, value: str, session):
     """Helper function to update a specific field in the extracted data"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
         # Verify item ownership
-        item = input_items[item_id]
+        item = get_input_item(read_db(), item_id)
         if item.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
@@ -1481,7 +2079,9 @@ def _update_extracted_field_helper(item_id: str, field: str, value: str, session
         
         # Save updated data back to database
         updated_data = json.dumps(data)
-        input_items.update({"extracted_data": updated_data}, item_id)
+        with write_transaction():
+            input_items.update({"extracted_data": updated_data}, item_id)
+            index_item_entities(db, item_id, item.user_id, updated_data)
         
         return "Updated"
         
@@ -1493,16 +2093,18 @@ def _update_extracted_field_helper(item_id: str, field: str, value: str, session
 def update_extracted_data(item_id: str, extracted_data: str, session):
     """Update entire extracted data for an input item"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
         # Verify item ownership
-        item = input_items[item_id]
+        item = get_input_item(read_db(), item_id)
         if item.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
         # Update extracted data
-        input_items.update({"extracted_data": extracted_data}, item_id)
+        with write_transaction():
+            input_items.update({"extracted_data": extracted_data}, item_id)
+            index_item_entities(db, item_id, item.user_id, extracted_data)
         
         return "Updated"
         
@@ -1514,11 +2116,11 @@ def update_extracted_data(item_id: str, extracted_data: str, session):
 def modal_detect_entity(item_id: str, session):
     """Return modal for entity detection input"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
         # Verify item ownership
-        item = input_items[item_id]
+        item = get_input_item(read_db(), item_id)
         if item.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
@@ -1568,11 +2170,11 @@ def modal_detect_entity(item_id: str, session):
 async def detect_entity_in_image(item_id: str, session, entity_type: str):
     """Detect entities in an image using Moondream API"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
         # Verify item ownership
-        item = input_items[item_id]
+        item = get_input_item(read_db(), item_id)
         if item.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
@@ -1666,7 +2268,6 @@ async def detect_entity_in_image(item_id: str, session, entity_type: str):
                         "✓ Accept",
                         hx_post=f"/accept-entity-detection/{item_id}",
                         hx_target="#modal-container",
-                        hx_vals=f'{{"preview_path": "{result["preview_path"]}", "original_path": "{result["original_path"]}"}}',
                         cls=ButtonT.primary
                     ),
                     Button(
@@ -1692,26 +2293,48 @@ async def detect_entity_in_image(item_id: str, session, entity_type: str):
         return Alert(f"Error detecting entities: {str(e)}", cls=AlertT.error)
 
 
+def save_replaced_image(item, new_path: Path, content_hash: str):
+    """Point an image item at its replacement file and queue new thumbnails"""
+    with write_transaction():
+        input_items.update(
+            {
+                "filename": new_path.name,
+                "file_path": str(new_path),
+                "file_size": new_path.stat().st_size,
+                "content_hash": content_hash,
+            },
+            item.id,
+        )
+        job_queue.enqueue("thumbnails", item.id, item.user_id)
+
+
 @rt("/accept-entity-detection/{item_id}", methods=["POST"])
-async def accept_entity_detection(item_id: str, session, preview_path: str, original_path: str):
-    """Accept entity detection by overwriting original image with preview"""
+async def accept_entity_detection(item_id: str, session):
+    """Accept entity detection by replacing the item's image with the preview"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
         # Verify item ownership
-        item = input_items[item_id]
+        item = get_input_item(read_db(), item_id)
         if item.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
-        # Copy preview image to original location
-        import shutil
-        shutil.copy2(preview_path, original_path)
-        
-        # Clean up preview file
-        import os
-        if os.path.exists(preview_path):
-            os.remove(preview_path)
+        original_path = Path(item.file_path)
+        preview_path = original_path.with_name(f"{original_path.stem}_preview{original_path.suffix}")
+        if not preview_path.exists():
+            return Alert("Detection preview not found", cls=AlertT.error)
+
+        # Move the preview to a fresh UUID name instead of overwriting the original:
+        # uploads are served as immutable, so a changed image needs a new URL
+        new_path = original_path.with_name(f"{generate_uuid()}{original_path.suffix}")
+        os.replace(preview_path, new_path)
+        content_hash = await asyncio.to_thread(file_sha256, new_path)
+        await asyncio.to_thread(save_replaced_image, item, new_path, content_hash)
+        invalidate_item_fragments(item, user.id)
+
+        original_path.unlink(missing_ok=True)
+        remove_derivatives(original_path)
         
         return Div(
             H3("✓ Entity Detection Applied!"),
@@ -1732,11 +2355,11 @@ async def accept_entity_detection(item_id: str, session, preview_path: str, orig
 async def reject_entity_detection(item_id: str, session, preview_path: str):
     """Reject entity detection by discarding preview and keeping original"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
         # Verify item ownership
-        item = input_items[item_id]
+        item = get_input_item(read_db(), item_id)
         if item.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
@@ -1770,11 +2393,11 @@ async def reject_entity_detection(item_id: str, session, preview_path: str):
 async def transcribe_audio_item(item_id: str, session, request):
     """Transcribe an audio input item"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
         # Verify item ownership
-        item = input_items[item_id]
+        item = get_input_item(read_db(), item_id)
         if item.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
@@ -1782,9 +2405,10 @@ async def transcribe_audio_item(item_id: str, session, request):
             return Div("Not an audio file")
         
         # Transcribe the audio
-        transcription = await transcribe_audio(item.file_path)
+        transcription = await transcribe_audio(item.file_path, cache=transcription_cache)
         
         # Update the item with transcription
+        invalidate_item_fragments(item, user.id)
         input_items.update({
             "transcription": transcription,
             "processed": True
@@ -1856,7 +2480,7 @@ async def transcribe_audio_item(item_id: str, session, request):
         else:
             # Extract workspace_id from request context if available
             workspace_id = request.headers.get("Referer", "").split("/")[-1] if "workspace" in request.headers.get("Referer", "") else None
-            return build_input_item_fragment(updated_item, workspace_id)
+            return build_input_item_fragment(updated_item, workspace_id, pending=item_pending(updated_item))
         
     except Exception as e:
         return Alert(f"Error transcribing audio: {str(e)}", cls=AlertT.error)
@@ -1866,143 +2490,136 @@ async def transcribe_audio_item(item_id: str, session, request):
 def add_item_to_workspace(workspace_id: str, item_id: str, session):
     """Add an existing input item to a workspace"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
         # Verify workspace ownership
-        workspace = workspaces[workspace_id]
+        workspace = get_workspace(read_db(), workspace_id)
         if workspace.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
         # Verify item ownership
-        item = input_items[item_id]
+        item = get_input_item(read_db(), item_id)
         if item.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
-        # Add item to workspace
-        current_item_ids = json.loads(workspace.input_item_ids or "[]")
-        if item_id not in current_item_ids:
-            current_item_ids.append(item_id)
-            workspaces.update({
-                "input_item_ids": json.dumps(current_item_ids),
-                "updated_at": get_current_timestamp()
-            }, workspace_id)
-        
-        # Get all current workspace items to rebuild the ingested-items div
-        updated_workspace = workspaces[workspace_id]
-        all_item_ids = json.loads(updated_workspace.input_item_ids or "[]")
-        all_items = []
-        if all_item_ids:
-            item_ids_str = "', '".join(all_item_ids)
-            all_items = input_items(where=f"id IN ('{item_ids_str}')")
-        
-        # Rebuild the entire ingested-items div with all items using unified fragment
-        items_content = []
-        for workspace_item in all_items:
-            items_content.append(build_input_item_fragment(workspace_item, workspace_id))
-        
-        # Create the updated ingested-items div
-        updated_ingested_items = Div(
-            *items_content if items_content else [P("No items added yet.")],
-            id="ingested-items",
-            _="on load or htmx:afterSwap if .input-item-article in me then remove @disabled from #generate-btn else add @disabled to #generate-btn",
-            hx_swap_oob="true"
-        )
+        # Add item to workspace; only a newly linked item gets a card appended
+        added = add_workspace_item(db, workspace_id, item_id)
+        if added:
+            workspaces.update({"updated_at": get_current_timestamp()}, workspace_id)
+        item_updates = workspace_items_added(workspace_id, [item] if added else [])
         
         # Update sidebar sections
         recent_workspaces_update = create_recent_workspaces_section(user.id, swap_oob=True)
         
-        # Check if there are any remaining items in the modal
-        updated_current_item_ids = json.loads(workspaces[workspace_id].input_item_ids or "[]")
-        remaining_items = [i for i in input_items(where=f"user_id = {user.id}") if i.id not in updated_current_item_ids]
-        
         # If no items remain, show the "no items" message
-        if not remaining_items:
+        if not has_items_not_in_workspace(read_db(), user.id, workspace_id):
             no_items_message = Div(
                 P("No additional input items available."),
                 id="modal-no-items",
                 hx_swap_oob="innerHTML:.modal-items-container"
             )
-            return Div(), updated_ingested_items, recent_workspaces_update, no_items_message
+            return Div(), *item_updates, recent_workspaces_update, no_items_message
         else:
             # Remove this item from modal (empty div to replace it)
-            return Div(), updated_ingested_items, recent_workspaces_update
+            return Div(), *item_updates, recent_workspaces_update
         
     except Exception as e:
         return Alert(f"Error: {str(e)}", cls=AlertT.error)
 
 
-@rt("/content/reports")
-def content_reports(session):
-    """Return reports content fragment"""
-    auth = session.get("auth")
-    user = users[auth]
-
-    user_reports = maintenance_reports(where=f"user_id == '{user.id}'")
-
-    reports_content = []
-    if user_reports:
-        for report in user_reports:
-            # Status label styling
-            status_label_class = {
-                'open': 'bg-amber-100 text-amber-800',
-                'in_progress': 'bg-blue-100 text-blue-800', 
-                'completed': 'bg-green-100 text-green-800',
-                'closed': 'bg-gray-100 text-gray-800'
-            }.get(report.status, 'bg-gray-100 text-gray-800')
-            
-            # Priority label styling
-            priority_label_class = {
-                'low': 'bg-green-100 text-green-800',
-                'medium': 'bg-yellow-100 text-yellow-800',
-                'high': 'bg-orange-100 text-orange-800',
-                'critical': 'bg-red-100 text-red-800'
-            }.get(report.priority, 'bg-gray-100 text-gray-800')
-
-            reports_content.append(
-                Card(
-                    CardHeader(
-                        DivFullySpaced(
-                            Button(
-                                report.title,
-                                hx_get=f"/content/view-report/{report.id}",
-                                hx_target="#main-content",
-                                cls=(ButtonT.ghost, "text-left p-0 h-auto font-medium hover:text-primary text-lg")
-                            ),
-                            DivLAligned(
-                                Label(
-                                    report.status.replace("_", " ").title(),
-                                    cls=status_label_class + " text-xs px-2 py-1 rounded-full"
-                                ),
-                                Label(
-                                    report.priority.title(),
-                                    cls=priority_label_class + " text-xs px-2 py-1 rounded-full ml-2"
-                                )
-                            )
-                        )
-                    ),
-                    CardBody(
-                        DivVStacked(
-                            P(
-                                report.description[:120] + "..." if len(report.description) > 120 else report.description,
-                                cls=TextPresets.muted_sm
-                            ),
-                            DivFullySpaced(
-                                Small(f"Equipment: {report.equipment_id}", cls=TextPresets.muted_sm),
-                                Small(
-                                    datetime.fromisoformat(report.created_at).strftime('%m/%d/%y %H:%M'),
-                                    cls=TextPresets.muted_sm
-                                )
-                            ),
-                            cls="space-y-3"
-                        )
-                    ),
-                    cls=(CardT.hover, "cursor-pointer"),
+def build_report_card(report):
+    """Build a report summary card for the reports listing"""
+    # Status label styling
+    status_label_class = {
+        'open': 'bg-amber-100 text-amber-800',
+        'in_progress': 'bg-blue-100 text-blue-800', 
+        'completed': 'bg-green-100 text-green-800',
+        'closed': 'bg-gray-100 text-gray-800'
+    }.get(report.status, 'bg-gray-100 text-gray-800')
+    
+    # Priority label styling
+    priority_label_class = {
+        'low': 'bg-green-100 text-green-800',
+        'medium': 'bg-yellow-100 text-yellow-800',
+        'high': 'bg-orange-100 text-orange-800',
+        'critical': 'bg-red-100 text-red-800'
+    }.get(report.priority, 'bg-gray-100 text-gray-800')
+
+    return Card(
+        CardHeader(
+            DivFullySpaced(
+                Button(
+                    report.title,
                     hx_get=f"/content/view-report/{report.id}",
-                    hx_target="#main-content"
+                    hx_target="#main-content",
+                    cls=(ButtonT.ghost, "text-left p-0 h-auto font-medium hover:text-primary text-lg")
+                ),
+                DivLAligned(
+                    Label(
+                        report.status.replace("_", " ").title(),
+                        cls=status_label_class + " text-xs px-2 py-1 rounded-full"
+                    ),
+                    Label(
+                        report.priority.title(),
+                        cls=priority_label_class + " text-xs px-2 py-1 rounded-full ml-2"
+                    )
                 )
             )
-    else:
+        ),
+        CardBody(
+            DivVStacked(
+                P(
+                    report.description[:120] + "..." if len(report.description) > 120 else report.description,
+                    cls=TextPresets.muted_sm
+                ),
+                DivFullySpaced(
+                    Small(f"Equipment: {report.equipment_id}", cls=TextPresets.muted_sm),
+                    Small(
+                        datetime.fromisoformat(report.created_at).strftime('%m/%d/%y %H:%M'),
+                        cls=TextPresets.muted_sm
+                    )
+                ),
+                cls="space-y-3"
+            )
+        ),
+        cls=(CardT.hover, "cursor-pointer"),
+        hx_get=f"/content/view-report/{report.id}",
+        hx_target="#main-content"
+    )
+
+
+def load_more_sentinel(url: str):
+    """Placeholder that swaps itself for the next page once scrolled into view"""
+    return Div(
+        Loading(cls=(LoadingT.dots, LoadingT.md)),
+        hx_get=url,
+        hx_trigger="revealed",
+        hx_swap="outerHTML",
+        cls="flex justify-center py-4 load-more-sentinel"
+    )
+
+
+@rt("/content/reports")
+def content_reports(session, cursor: str = None):
+    """Return reports content fragment, or the next page of cards when a cursor is given"""
+    auth = session.get("auth")
+    user = get_user(read_db(), auth)
+
+    try:
+        page, next_cursor = page_reports(read_db(), user.id, PAGE_SIZE, cursor)
+    except ValueError:
+        return Response("Invalid cursor", status_code=400)
+
+    reports_content = [build_report_card(report) for report in page]
+    if next_cursor:
+        reports_content.append(load_more_sentinel(f"/content/reports?cursor={quote(next_cursor)}"))
+
+    # Infinite scroll request: only the new cards and the next sentinel
+    if cursor:
+        return tuple(reports_content)
+
+    if not reports_content:
         reports_content = [
             Card(
                 CardBody(
@@ -2027,7 +2644,7 @@ def content_reports(session):
     return Container(
         Section(
             H1("Maintenance Reports"),
-            Subtitle(f"You have {len(user_reports)} saved reports"),
+            Subtitle(f"You have {get_user_stats(read_db(), user.id)['total']} saved reports"),
             cls=SectionT.default
         ),
         Section(
@@ -2045,19 +2662,14 @@ def content_reports(session):
 def content_dashboard(session):
     """Return dashboard content fragment"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
 
-    user_reports = maintenance_reports(where=f"user_id = {user.id}")
-    total_reports = len(user_reports)
+    counts = get_user_stats(read_db(), user.id)
+    total_reports = counts["total"]
+    status_counts = counts["status"]
+    priority_counts = counts["priority"]
 
-    status_counts = {"open": 0, "in_progress": 0, "completed": 0, "closed": 0}
-    priority_counts = {"low": 0, "medium": 0, "high": 0, "critical": 0}
-
-    for report in user_reports:
-        status_counts[report.status] = status_counts.get(report.status, 0) + 1
-        priority_counts[report.priority] = priority_counts.get(report.priority, 0) + 1
-
-    recent_reports = sorted(user_reports, key=lambda r: r.created_at, reverse=True)[:5]
+    latest_reports = recent_reports(read_db(), user.id, limit=5)
 
     return Container(
         Section(
@@ -2203,9 +2815,9 @@ def content_dashboard(session):
                                             hx_get=f"/content/view-report/{report.id}",
                                             hx_target="#main-content"
                                         )
-                                        for report in recent_reports
+                                        for report in latest_reports
                                     ]
-                                    if recent_reports
+                                    if latest_reports
                                     else [
                                         Center(
                                             P("No reports created yet", cls=TextPresets.muted_sm + " py-8")
@@ -2262,79 +2874,96 @@ def content_dashboard(session):
     )
 
 
-@rt("/content/workspaces")
-def content_workspaces(session):
-    """Return all workspaces content fragment"""
-    auth = session.get("auth")
-    user = users[auth]
-    
-    user_workspaces = workspaces(where=f"user_id = {user.id}")
+def build_workspace_row(workspace, item_count: int):
+    """Build a workspace card with its delete button for the workspaces listing"""
+    # Status styling
+    status_styles = {
+        "draft": (LabelT.secondary, "Draft"),
+        "processing": ("bg-orange-100 text-orange-800", "Processing"), 
+        "completed": ("bg-green-100 text-green-800", "Completed")
+    }
+    status_style, status_text = status_styles.get(workspace.status, (LabelT.secondary, workspace.status.title()))
     
-    workspaces_content = []
-    if user_workspaces:
-        for workspace in user_workspaces:
-            item_count = len(json.loads(workspace.input_item_ids or "[]"))
-            
-            # Status styling
-            status_styles = {
-                "draft": (LabelT.secondary, "Draft"),
-                "processing": ("bg-orange-100 text-orange-800", "Processing"), 
-                "completed": ("bg-green-100 text-green-800", "Completed")
-            }
-            status_style, status_text = status_styles.get(workspace.status, (LabelT.secondary, workspace.status.title()))
-            
-            workspaces_content.append(
+    return DivLAligned(
+        Card(
+            CardHeader(
                 DivLAligned(
-                    Card(
-                        CardHeader(
-                            DivLAligned(
-                                UkIcon("folder", height=20, width=20, cls="mr-3 text-muted-foreground"),
-                                DivVStacked(
-                                    H4(workspace.name, cls=TextT.medium),
-                                    DivLAligned(
-                                        Label(status_text, cls=status_style if isinstance(status_style, str) else status_style),
-                                        Small(f"{item_count} item{'s' if item_count != 1 else ''}", cls=TextPresets.muted_sm),
-                                        cls="space-x-2 mt-1"
-                                    )
-                                )
-                            )
-                        ),
-                        CardBody(
-                            DivLAligned(
-                                DivLAligned(
-                                    UkIcon("calendar", height=14, width=14, cls="mr-1 text-muted-foreground"),
-                                    Small(f"Created {datetime.fromisoformat(workspace.created_at).strftime('%m/%d/%y')}", cls=TextPresets.muted_sm)
-                                ),
-                                DivLAligned(
-                                    UkIcon("clock", height=14, width=14, cls="mr-1 text-muted-foreground"),
-                                    Small(f"Updated {datetime.fromisoformat(workspace.updated_at).strftime('%m/%d/%y')}", cls=TextPresets.muted_sm)
-                                ),
-                                cls="space-x-4"
-                            )
-                        ),
-                        hx_get=f"/content/workspace/{workspace.id}",
-                        hx_target="#main-content",
-                        cls=(CardT.hover, "cursor-pointer flex-1"),
-                        title=f"Open {workspace.name}"
+                    UkIcon("folder", height=20, width=20, cls="mr-3 text-muted-foreground"),
+                    DivVStacked(
+                        H4(workspace.name, cls=TextT.medium),
+                        DivLAligned(
+                            Label(status_text, cls=status_style if isinstance(status_style, str) else status_style),
+                            Small(f"{item_count} item{'s' if item_count != 1 else ''}", cls=TextPresets.muted_sm),
+                            cls="space-x-2 mt-1"
+                        )
+                    )
+                )
+            ),
+            CardBody(
+                DivLAligned(
+                    DivLAligned(
+                        UkIcon("calendar", height=14, width=14, cls="mr-1 text-muted-foreground"),
+                        Small(f"Created {datetime.fromisoformat(workspace.created_at).strftime('%m/%d/%y')}", cls=TextPresets.muted_sm)
                     ),
-                    Button(
-                        UkIcon("trash-2", height=20, width=20),
-                        hx_delete=f"/delete-workspace/{workspace.id}",
-                        hx_target="closest div",
-                        hx_swap="outerHTML",
-                        hx_confirm="Are you sure you want to delete this workspace?",
-                        cls=(ButtonT.destructive, "ml-4 p-3"),
-                        title="Delete workspace",
-                        _="on htmx:afterRequest if detail.successful then wait 10ms then set #workspaces-count's textContent to 'You have ' + document.querySelectorAll('#main-content .card').length + ' workspaces.' end"
+                    DivLAligned(
+                        UkIcon("clock", height=14, width=14, cls="mr-1 text-muted-foreground"),
+                        Small(f"Updated {datetime.fromisoformat(workspace.updated_at).strftime('%m/%d/%y')}", cls=TextPresets.muted_sm)
                     ),
-                    cls="mb-4 items-start"
+                    cls="space-x-4"
                 )
-            )
+            ),
+            hx_get=f"/content/workspace/{workspace.id}",
+            hx_target="#main-content",
+            cls=(CardT.hover, "cursor-pointer flex-1"),
+            title=f"Open {workspace.name}"
+        ),
+        Button(
+            UkIcon("trash-2", height=20, width=20),
+            hx_delete=f"/delete-workspace/{workspace.id}?source=list",
+            hx_target="closest div",
+            hx_swap="outerHTML",
+            hx_confirm="Are you sure you want to delete this workspace?",
+            cls=(ButtonT.destructive, "ml-4 p-3"),
+            title="Delete workspace"
+        ),
+        cls="mb-4 items-start"
+    )
+
+
+def create_workspaces_count(user_id: int, swap_oob: bool = False):
+    """Create the workspace count subtitle with optional swap-oob"""
+    total = count_user_rows(read_db(), "workspace", user_id)
+    return Subtitle(
+        f"You have {total} workspace{'s' if total != 1 else ''}",
+        id="workspaces-count",
+        hx_swap_oob="true" if swap_oob else "false",
+    )
+
+
+@rt("/content/workspaces")
+def content_workspaces(session, cursor: str = None):
+    """Return all workspaces content fragment, or the next page of rows when a cursor is given"""
+    auth = session.get("auth")
+    user = get_user(read_db(), auth)
+    
+    try:
+        page, next_cursor = page_workspaces(read_db(), user.id, PAGE_SIZE, cursor)
+    except ValueError:
+        return Response("Invalid cursor", status_code=400)
+    item_counts = count_items_for_workspaces(read_db(), [workspace.id for workspace in page])
+    
+    workspaces_content = [build_workspace_row(workspace, item_counts[workspace.id]) for workspace in page]
+    if next_cursor:
+        workspaces_content.append(load_more_sentinel(f"/content/workspaces?cursor={quote(next_cursor)}"))
+    
+    # Infinite scroll request: only the new rows and the next sentinel
+    if cursor:
+        return tuple(workspaces_content)
     
     return Container(
         Section(
             H1("All Workspaces"),
-            Subtitle(f"You have {len(user_workspaces)} workspace{'s' if len(user_workspaces) != 1 else ''}", id="workspaces-count"),
+            create_workspaces_count(user.id),
             cls=SectionT.default
         ),
         
@@ -2380,24 +3009,167 @@ def content_workspaces(session):
     )
 
 
+def build_search_results(user_id: int, q: str, limit: int = PAGE_SIZE):
+    """Ranked input item and report matches for a search query"""
+    if not q.strip():
+        return Div(P("Type to search transcriptions, extracted entities and reports", cls=TextPresets.muted_sm), id="search-results")
+
+    started = time.perf_counter()
+    conn = read_db()
+    items = search_input_items(conn, user_id, q, limit)
+    reports = search_reports(conn, user_id, q, limit)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    def result(title, subtitle, snippet, url):
+        return Div(
+            Div(title, cls=TextT.medium),
+            Div(subtitle, cls=TextPresets.muted_sm),
+            P(NotStr(snippet), cls="text-sm mt-1"),
+            hx_get=url,
+            hx_target="#main-content",
+            cls="p-3 mb-2 rounded-md cursor-pointer transition-colors hover:bg-secondary border border-transparent",
+        )
+
+    sections = []
+    if reports:
+        sections.append(Card(
+            CardHeader(H4(f"Reports ({len(reports)})")),
+            CardBody(*[
+                result(r["title"], f"{r['priority']} • {r['status'].replace('_', ' ')}", r["snippet"], f"/content/view-report/{r['id']}")
+                for r in reports
+            ]),
+            cls=(CardT.default, "mb-6"),
+        ))
+    if items:
+        sections.append(Card(
+            CardHeader(H4(f"Inputs ({len(items)})")),
+            CardBody(*[
+                result(i["original_filename"], f"{i['file_type'].title()} • {datetime.fromisoformat(i['uploaded_at']).strftime('%m/%d')}", i["snippet"], f"/content/view-input/{i['id']}")
+                for i in items
+            ]),
+            cls=(CardT.default, "mb-6"),
+        ))
+    return Div(
+        P(f"{len(reports) + len(items)} results in {elapsed_ms:.1f} ms", cls=TextPresets.muted_sm + " mb-4"),
+        *(sections or [P(f'No matches for "{q}"', cls=TextPresets.muted_sm)]),
+        id="search-results",
+    )
+
+
+@rt("/search")
+def search(session, q: str = ""):
+    """Full-text search results fragment (prefix matching, best matches first)"""
+    return build_search_results(session.get("auth"), q)
+
+
+@rt("/content/search")
+def content_search(session, q: str = ""):
+    """Return the search page content fragment"""
+    return Container(
+        Section(
+            H1("Search"),
+            Subtitle("Find inputs and reports by part number, equipment, defect code or any text"),
+            cls=SectionT.default
+        ),
+        Section(
+            Input(
+                type="search",
+                name="q",
+                value=q,
+                placeholder="e.g. x3d, boeing 737, hydraulic leak",
+                hx_get="/search",
+                hx_trigger="input changed delay:300ms, search",
+                hx_target="#search-results",
+                hx_swap="outerHTML",
+                autofocus=True,
+                cls="mb-6",
+            ),
+            build_search_results(session.get("auth"), q),
+            cls=SectionT.default
+        ),
+        cls=ContainerT.lg
+    )
+
+
+def entity_links(kind: str, values: list) -> list:
+    """Comma-separated links to the history page of each entity value"""
+    links = []
+    for value in (v.strip() for v in values if v and v.strip()):
+        if links:
+            links.append(", ")
+        links.append(A(
+            value,
+            hx_get=f"/content/history?kind={kind}&value={quote(value)}",
+            hx_target="#main-content",
+            cls="cursor-pointer hover:text-primary underline",
+        ))
+    return links
+
+
+@rt("/content/history")
+def content_history(session, kind: str, value: str):
+    """Every report and input item that mentions one equipment id, part number or defect code"""
+    if kind not in ENTITY_KINDS:
+        return Alert(f"Unknown entity kind: {kind}", cls=AlertT.error)
+    history = entity_history(read_db(), session.get("auth"), kind, value)
+
+    def entry(title, subtitle, url):
+        return Div(
+            Div(title, cls=TextT.medium),
+            Div(subtitle, cls=TextPresets.muted_sm),
+            hx_get=url,
+            hx_target="#main-content",
+            cls="p-3 mb-2 rounded-md cursor-pointer transition-colors hover:bg-secondary border border-transparent",
+        )
+
+    reports = [
+        entry(r["title"], f"{r['priority']} • {r['status'].replace('_', ' ')} • {datetime.fromisoformat(r['created_at']).strftime('%m/%d/%Y')}", f"/content/view-report/{r['id']}")
+        for r in history["reports"]
+    ]
+    items = [
+        entry(i["original_filename"], f"{i['file_type'].title()} • {datetime.fromisoformat(i['uploaded_at']).strftime('%m/%d/%Y')}", f"/content/view-input/{i['id']}")
+        for i in history["items"]
+    ]
+    return Container(
+        Section(
+            H1(f"History for {value}"),
+            Subtitle(f"{kind.title()} • {len(reports)} reports, {len(items)} inputs"),
+            cls=SectionT.default
+        ),
+        Section(
+            Card(CardHeader(H4("Reports")), CardBody(*(reports or [P("No reports", cls=TextPresets.muted_sm)])), cls=(CardT.default, "mb-6")),
+            Card(CardHeader(H4("Inputs")), CardBody(*(items or [P("No inputs", cls=TextPresets.muted_sm)])), cls=(CardT.default, "mb-6")),
+            cls=SectionT.default
+        ),
+        cls=ContainerT.lg
+    )
+
+
 @rt("/content/inputs")
-def content_inputs(session):
-    """Return all inputs content fragment"""
+def content_inputs(session, cursor: str = None):
+    """Return all inputs content fragment, or the next page of items when a cursor is given"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
-    user_inputs = input_items(where=f"user_id = {user.id}")
+    try:
+        page, next_cursor = page_input_items(read_db(), user.id, PAGE_SIZE, cursor)
+    except ValueError:
+        return Response("Invalid cursor", status_code=400)
     
-    inputs_content = []
-    if user_inputs:
-        for input_item in user_inputs:
-            inputs_content.append(build_input_item_fragment(input_item))
-    else:
+    inputs_content = render_input_item_fragments(page)
+    if next_cursor:
+        inputs_content.append(load_more_sentinel(f"/content/inputs?cursor={quote(next_cursor)}"))
+    
+    # Infinite scroll request: only the new cards and the next sentinel
+    if cursor:
+        return tuple(inputs_content)
+    
+    if not inputs_content:
         inputs_content = [P("No input items available yet.")]
     
     return Div(
         H1("Input Items"),
-        P(f"You have {len(user_inputs)} uploaded items.", id="inputs-count"),
+        P(f"You have {count_user_rows(read_db(), 'input_item', user.id)} uploaded items.", id="inputs-count"),
         Div(*inputs_content, id="inputs-list"),
         Div(id="modal-container")
     )
@@ -2407,9 +3179,9 @@ def content_inputs(session):
 def content_view_input(input_id: str, session):
     """Return view input content fragment"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     try:
-        input_item = input_items[input_id]
+        input_item = get_input_item(read_db(), input_id)
         
         # Build transcription section based on file type and transcription status
         transcription_section = None
@@ -2473,10 +3245,18 @@ def content_view_input(input_id: str, session):
                 ), 
                 CardBody(
                     Center(
-                        Img(
-                            src=f"uploads/images/{Path(input_item.file_path).name}",
-                            alt=f"Preview of {input_item.original_filename}",
-                            cls="max-w-full max-h-96 rounded-lg object-contain shadow-sm"
+                        A(
+                            Img(
+                                src=derivative_url(input_item.file_path, "medium"),
+                                srcset=image_srcset(input_item.file_path),
+                                sizes="(min-width: 1024px) 1024px, 100vw",
+                                decoding="async",
+                                alt=f"Preview of {input_item.original_filename}",
+                                cls="max-w-full max-h-96 rounded-lg object-contain shadow-sm"
+                            ),
+                            href=f"uploads/images/{Path(input_item.file_path).name}",
+                            target="_blank",
+                            title="Open full size"
                         )
                     )
                 ),
@@ -2682,7 +3462,7 @@ def content_view_input(input_id: str, session):
 def content_view_report(report_id: str, session):
     """Return view report content fragment"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     try:
         report = maintenance_reports[report_id]
 
@@ -2696,7 +3476,7 @@ def content_view_report(report_id: str, session):
                     Div(
                         H2(report.title),
                         P(Strong("Description: "), report.description),
-                        P(Strong("Equipment ID: "), report.equipment_id),
+                        P(Strong("Equipment ID: "), *entity_links("equipment", report.equipment_id.split(","))),
                         P(
                             Strong("Priority: "),
                             Span(
@@ -2705,11 +3485,11 @@ def content_view_report(report_id: str, session):
                         ),
                         P(
                             Strong("Part Numbers: "),
-                            ", ".join(json.loads(report.part_numbers or "[]")),
+                            *entity_links("part", json.loads(report.part_numbers or "[]")),
                         ),
                         P(
                             Strong("Defect Codes: "),
-                            ", ".join(json.loads(report.defect_codes or "[]")),
+                            *entity_links("defect", json.loads(report.defect_codes or "[]")),
                         ),
                         P(Strong("Corrective Action: "), report.corrective_action),
                         P(
@@ -2747,7 +3527,7 @@ def content_view_report(report_id: str, session):
 def content_edit_report(report_id: str, session):
     """Return edit report content fragment"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     try:
         report = maintenance_reports[report_id]
 
@@ -2863,18 +3643,15 @@ def content_edit_report(report_id: str, session):
         return Div("Report not found")
 
 @rt("/content/generate-report")
-async def content_generate_report(workspace_id: str, session):
-    """Generate a maintenance report from workspace items and return content fragment"""
+async def content_generate_report(workspace_id: str, session, stream: bool = False):
+    """Generate a maintenance report from workspace items and return content fragment
+
+    With stream=true the page shell comes back immediately and the report fields
+    fill in over SSE from /stream/generate-report as the model writes them.
+    """
     auth = session.get("auth")
-    user = users[auth]
-    workspace = workspaces[workspace_id]
-    item_ids = json.loads(workspace.input_item_ids or "[]")
-    
-    if not item_ids:
-        items = []
-    else:
-        item_ids_str = "', '".join(item_ids)
-        items = input_items(where=f"id IN ('{item_ids_str}')")
+    user = get_user(read_db(), auth)
+    items = list_workspace_items(read_db(), workspace_id)
 
     if not items:
         return Div(
@@ -2888,29 +3665,12 @@ async def content_generate_report(workspace_id: str, session):
             ),
         )
 
-    await process_items(workspace_id, session)
-
-    workspace = workspaces[workspace_id]
-    item_ids = json.loads(workspace.input_item_ids or "[]")
-    
-    if not item_ids:
-        items = []
-    else:
-        item_ids_str = "', '".join(item_ids)
-        items = input_items(where=f"id IN ('{item_ids_str}')")
+    if stream:
+        return build_report_stream_shell(workspace_id)
 
-    items_data = []
-    for item in items:
-        items_data.append(
-            {
-                "filename": item.original_filename,
-                "type": item.file_type,
-                "transcription": item.transcription,
-                "extracted_data": item.extracted_data,
-            }
-        )
+    await process_items(workspace_id, session)
 
-    report_data = await generate_maintenance_report(items_data)
+    report_data = await generate_workspace_report(workspace_id)
 
     if "error" in report_data:
         return Div(
@@ -2924,27 +3684,7 @@ async def content_generate_report(workspace_id: str, session):
             ),
         )
 
-    report_id = generate_uuid()
-    maintenance_reports.insert(
-        MaintenanceReport(
-            id=report_id,
-            workspace_id=workspace_id,
-            user_id=user.id,
-            title=report_data.get("title", "Generated Maintenance Report"),
-            description=report_data.get("description", ""),
-            equipment_id=report_data.get("equipment_id", ""),
-            part_numbers=json.dumps(report_data.get("part_numbers", [])),
-            defect_codes=json.dumps(report_data.get("defect_codes", [])),
-            corrective_action=report_data.get("corrective_action", ""),
-            parts_used=json.dumps(report_data.get("parts_used", [])),
-            next_service_date=report_data.get("next_service_date", ""),
-            priority=report_data.get("priority", "medium"),
-            status="open",
-            created_at=get_current_timestamp(),
-            updated_at=get_current_timestamp(),
-            finalized=False,
-        )
-    )
+    report_id = await asyncio.to_thread(save_generated_report, workspace_id, user.id, report_data)
 
     main_content = Div(
         H1("Generated Maintenance Report"),
@@ -2987,10 +3727,145 @@ async def content_generate_report(workspace_id: str, session):
     return main_content, recent_reports_update, dashboard_stats_update
 
 
+def _report_field_text(name: str, value) -> str:
+    if isinstance(value, list):
+        return ", ".join(str(v) for v in value)
+    return value.title() if name == "priority" else value
+
+
+def _report_stream_status(text: str, busy: bool = True):
+    return (Loading(cls=(LoadingT.dots, LoadingT.sm)), Span(text)) if busy else (Span(text, cls=TextPresets.muted_sm),)
+
+
+def _report_stream_failed(message: str):
+    """Terminal SSE events for a report stream that ended without a report"""
+    yield sse_message(_report_stream_status("Report generation failed", busy=False), event="status")
+    yield sse_message(
+        Div(
+            P(message, cls="text-red-600 mb-4"),
+            Button(
+                "Back to Workspace",
+                hx_get="/content/workspace",
+                hx_target="#main-content",
+                cls=ButtonT.primary,
+            ),
+        ),
+        event="done",
+    )
+
+
+async def _with_event_ids(messages):
+    """Number SSE messages so a reconnecting EventSource sends Last-Event-ID"""
+    count = 0
+    async for message in messages:
+        count += 1
+        yield f"id: {count}\n{message}"
+
+
+# Workspaces with a report stream in progress in this process
+reports_in_flight = set()
+
+
+def build_report_stream_shell(workspace_id: str):
+    """Report page whose fields are filled in by server-sent events as the report streams"""
+    def field(label, name):
+        return P(Strong(f"{label}: "), Span(sse_swap=name))
+
+    return Div(
+        H1("Generated Maintenance Report"),
+        DivLAligned(
+            *_report_stream_status("Processing workspace items..."),
+            sse_swap="status",
+            cls="space-x-2 mb-4",
+            id="report-stream-status",
+        ),
+        Div(
+            H2(sse_swap="title"),
+            field("Description", "description"),
+            field("Equipment ID", "equipment_id"),
+            field("Priority", "priority"),
+            field("Part Numbers", "part_numbers"),
+            field("Defect Codes", "defect_codes"),
+            field("Corrective Action", "corrective_action"),
+            field("Parts Used", "parts_used"),
+            field("Next Service Date", "next_service_date"),
+            cls="report-section",
+        ),
+        Div(sse_swap="done"),
+        hx_ext="sse",
+        sse_connect=f"/stream/generate-report?workspace_id={quote(workspace_id)}",
+        sse_close="done",
+    )
+
+
+@rt("/stream/generate-report")
+async def stream_generate_report(workspace_id: str, session, request):
+    """SSE stream of a report being generated: status, one event per field, then done.
+
+    Every stream ends with a done event, which closes the EventSource. A stream
+    that drops before that would reconnect with Last-Event-ID; reconnects, and a
+    second stream for a workspace already generating, get a done event instead
+    of another (paid) generation.
+    """
+    auth = session.get("auth")
+    user = get_user(read_db(), auth)
+
+    async def events():
+        if request.headers.get("last-event-id") or workspace_id in reports_in_flight:
+            for message in _report_stream_failed(
+                "This report was already started. Check Reports before generating it again."
+            ):
+                yield message
+            return
+        reports_in_flight.add(workspace_id)
+        try:
+            async for message in generate():
+                yield message
+        except Exception as e:
+            for message in _report_stream_failed(f"Error: {str(e)}"):
+                yield message
+        finally:
+            reports_in_flight.discard(workspace_id)
+
+    async def generate():
+        await process_items(workspace_id, session)
+        yield sse_message(_report_stream_status("Writing report..."), event="status")
+
+        sent = {}
+        async for update in stream_workspace_report(workspace_id):
+            if "fields" in update:
+                # Only send the fields that changed with this token
+                for name, value in update["fields"].items():
+                    if sent.get(name) != value:
+                        sent[name] = value
+                        yield sse_message(Span(_report_field_text(name, value)), event=name)
+            elif "report" in update:
+                report_id = await asyncio.to_thread(save_generated_report, workspace_id, user.id, update["report"])
+                yield sse_message(_report_stream_status("Report saved", busy=False), event="status")
+                yield sse_message(
+                    Div(
+                        Button(
+                            "Edit Report",
+                            hx_get=f"/content/edit-report/{report_id}",
+                            hx_target="#main-content",
+                            cls=ButtonT.primary,
+                        ),
+                        create_recent_reports_section(user.id, swap_oob=True),
+                        create_dashboard_stats_section(user.id, swap_oob=True),
+                    ),
+                    event="done",
+                )
+            else:
+                for message in _report_stream_failed(f"Error: {update['error']}"):
+                    yield message
+
+    return EventStream(_with_event_ids(events()))
+
+
 @rt("/update-report-content/{report_id}")
 async def update_report_content(report_id:str, session, request):
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     # Parse form data
     form_data = await request.form()
@@ -3012,23 +3887,21 @@ async def update_report_content(report_id:str, session, request):
         defect_codes_list = [d.strip() for d in defect_codes.split(",") if d.strip()]
         parts_used_list = [p.strip() for p in parts_used.split(",") if p.strip()]
 
-        maintenance_reports.update(
-            {
-                "title": title,
-                "description": description,
-                "equipment_id": equipment_id,
-                "priority": priority,
-                "part_numbers": json.dumps(part_numbers_list),
-                "defect_codes": json.dumps(defect_codes_list),
-                "corrective_action": corrective_action,
-                "parts_used": json.dumps(parts_used_list),
-                "next_service_date": (
-                    next_service_date + "T00:00:00" if next_service_date else ""
-                ),
-                "updated_at": get_current_timestamp(),
-            },
-            report_id,
-        )
+        updates = {
+            "title": title,
+            "description": description,
+            "equipment_id": equipment_id,
+            "priority": priority,
+            "part_numbers": json.dumps(part_numbers_list),
+            "defect_codes": json.dumps(defect_codes_list),
+            "corrective_action": corrective_action,
+            "parts_used": json.dumps(parts_used_list),
+            "next_service_date": (
+                next_service_date + "T00:00:00" if next_service_date else ""
+            ),
+            "updated_at": get_current_timestamp(),
+        }
+        await asyncio.to_thread(save_report_updates, report_id, updates)
 
         main_content = content_view_report(report_id, session)
         recent_reports_update = create_recent_reports_section(user.id, swap_oob=True)
@@ -3043,39 +3916,18 @@ async def update_report_content(report_id:str, session, request):
 def remove_from_workspace(workspace_id: str, input_id: str, session):
     """Remove an input item from a workspace without deleting the item"""
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
-        workspace = workspaces[workspace_id]
+        workspace = get_workspace(read_db(), workspace_id)
         if workspace.user_id != user.id: return Div("Unauthorized")
         
         # Remove item from workspace
-        item_ids = json.loads(workspace.input_item_ids or "[]")
-        if input_id in item_ids:
-            item_ids.remove(input_id)
-            workspaces.update({"input_item_ids": json.dumps(item_ids)}, workspace_id)
-        
-        # Rebuild the entire ingested-items div with remaining items
-        updated_workspace = workspaces[workspace_id]
-        all_item_ids = json.loads(updated_workspace.input_item_ids or "[]")
-        all_items = []
-        if all_item_ids:
-            item_ids_str = "', '".join(all_item_ids)
-            all_items = input_items(where=f"id IN ('{item_ids_str}')")
-        
-        # Create the updated ingested-items div
-        items_content = []
-        for workspace_item in all_items:
-            items_content.append(build_input_item_fragment(workspace_item, workspace_id))
-        
-        updated_ingested_items = Div(
-            *items_content if items_content else [P("No items added yet.", cls=(TextPresets.muted_sm, "italic"))],
-            id="ingested-items",
-            _="on load or htmx:afterSwap if .input-item-article in me then remove @disabled from #generate-btn else add @disabled to #generate-btn",
-            hx_swap_oob="true"
-        )
+        if remove_workspace_item(db, workspace_id, input_id):
+            fragment_cache.invalidate(get_input_item(read_db(), input_id), [workspace_id])
         
-        return updated_ingested_items
+        # The card itself is the swap target, so empty content removes it
+        return "", *workspace_items_removed(workspace_id)
         
     except Exception as e: 
         return Div(f"Error removing item from workspace: {str(e)}")
@@ -3083,26 +3935,25 @@ def remove_from_workspace(workspace_id: str, input_id: str, session):
 @rt("/delete-input/{input_id}", methods=["DELETE"])
 def delete_input(input_id: str, session):
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
-        input_item = input_items[input_id]
+        input_item = get_input_item(read_db(), input_id)
         if input_item.user_id != user.id: return Div("Unauthorized")
         
         try:
             import os
             if os.path.exists(input_item.file_path):
                 os.remove(input_item.file_path)
+            if input_item.file_type == "image":
+                remove_derivatives(input_item.file_path)
         except Exception as e: print(f"Failed to delete file {input_item.file_path}: {e}")
         
-        user_workspaces = workspaces(where=f"user_id = {user.id}")
-        for workspace in user_workspaces:
-            item_ids = json.loads(workspace.input_item_ids or "[]")
-            if input_id in item_ids:
-                item_ids.remove(input_id)
-                workspaces.update({"input_item_ids": json.dumps(item_ids)}, workspace.id)
-        
-        input_items.delete(input_id)
+        invalidate_item_fragments(input_item, user.id)
+        with write_transaction():
+            remove_item_from_workspaces(db, input_id)
+            remove_entity_refs(db, "input_item", input_id)
+            input_items.delete(input_id)
         return create_recent_uploads_section(user.id, swap_oob=True)
     except Exception as e: return Div(f"Error deleting input: {str(e)}")
 
@@ -3110,10 +3961,10 @@ def delete_input(input_id: str, session):
 @rt("/update-workspace/{workspace_id}", methods=["PUT"])
 def update_workspace(workspace_id: str, session, updates: dict):
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
-        workspace = workspaces[workspace_id]
+        workspace = get_workspace(read_db(), workspace_id)
         if workspace.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
@@ -3134,22 +3985,27 @@ def update_workspace(workspace_id: str, session, updates: dict):
 @rt("/delete-workspace/{workspace_id}", methods=["DELETE"])
 def delete_workspace(workspace_id: str, session, source: str = None):
     auth = session.get("auth")
-    user = users[auth]
+    user = get_user(read_db(), auth)
     
     try:
-        workspace = workspaces[workspace_id]
+        workspace = get_workspace(read_db(), workspace_id)
         if workspace.user_id != user.id:
             return Alert("Unauthorized", cls=AlertT.error)
         
         
         # Delete the workspace
-        workspaces.delete(workspace_id)
+        with write_transaction():
+            clear_workspace_items(db, workspace_id)
+            workspace_summaries.forget(workspace_id)
+            workspaces.delete(workspace_id)
         
         # Return updated sidebar sections
         recent_workspaces_update = create_recent_workspaces_section(user.id, swap_oob=True)
         if source and source == "workspace":
             main_content = content_workspaces(session)
             return main_content, recent_workspaces_update
+        if source and source == "list":
+            return recent_workspaces_update, create_workspaces_count(user.id, swap_oob=True)
         return recent_workspaces_update
         
     except Exception as e:
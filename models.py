@@ -13,7 +13,12 @@ class Workspace:
     created_at: str
     updated_at: str
     status: str = "draft"  # draft, processing, completed
-    input_item_ids: str = "[]"  # JSON array of input item IDs
+    input_item_ids: str = "[]"  # Legacy JSON array, migrated into workspace_item
+
+class WorkspaceItem:
+    workspace_id: str
+    input_item_id: str
+    added_at: str
 
 class InputItem:
     id: str  # UUID
@@ -28,6 +33,8 @@ class InputItem:
     processed: bool = False
     transcription: str = ""
     extracted_data: str = ""  # JSON string
+    content_hash: str = ""  # sha256 of the stored file
+    version: int = 0  # bumped by a trigger on every update
 
 class MaintenanceReport:
     id: str  # UUID
@@ -47,6 +54,73 @@ class MaintenanceReport:
     updated_at: str
     finalized: bool = False
 
+class UserStats:
+    user_id: int
+    total_reports: int = 0
+    open_reports: int = 0
+    in_progress_reports: int = 0
+    completed_reports: int = 0
+    closed_reports: int = 0
+    low_priority: int = 0
+    medium_priority: int = 0
+    high_priority: int = 0
+    critical_priority: int = 0
+
+class TranscriptionCacheEntry:
+    audio_hash: str  # SHA-256 of the audio bytes
+    model: str
+    transcription: str
+    size: int  # bytes of cached text, counted against the cache budget
+    created_at: str
+    last_used_at: str
+    hits: int = 0
+
+class EntityCacheEntry:
+    text_hash: str  # SHA-256 of the normalized text
+    model: str
+    prompt_version: str
+    result: str  # JSON string returned by the extraction
+    created_at: str
+    last_used_at: str
+    hits: int = 0
+
+class UploadSession:
+    id: str  # UUID
+    user_id: int
+    workspace_id: str
+    original_filename: str
+    mime_type: str
+    total_size: int
+    created_at: str
+    updated_at: str
+
+class Job:
+    id: str  # UUID
+    kind: str  # transcribe, extract
+    input_item_id: str
+    user_id: int
+    status: str = "queued"  # queued, running, done, failed
+    attempts: int = 0
+    error: str = ""
+    created_at: str
+    updated_at: str
+
+class EntityRef:
+    kind: str  # equipment, part, defect
+    value: str  # normalized (upper-cased, single-spaced) for lookups
+    source_type: str  # input_item, report
+    source_id: str
+    user_id: int
+    display: str  # value as written in the source
+
+class WorkspaceSummary:
+    workspace_id: str
+    prompt_version: str
+    item_digests: str  # JSON {input_item_id: digest} of the items the report covers
+    report: str  # JSON of the last generated report; the summary later regenerations build on
+    created_at: str
+    updated_at: str
+
 class ReportAnnotation:
     id: str  # UUID
     report_id: str
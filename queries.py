@@ -0,0 +1,329 @@
+import json
+from models import InputItem, MaintenanceReport, User, Workspace
+from utils import get_current_timestamp
+
+
+# Workspace membership (workspace_item link table)
+def list_workspace_items(db, workspace_id: str) -> list:
+    """Return the input items in a workspace, in the order they were added"""
+    rows = db.q(
+        """
+        SELECT input_item.* FROM workspace_item
+        JOIN input_item ON input_item.id = workspace_item.input_item_id
+        WHERE workspace_item.workspace_id = ?
+        ORDER BY workspace_item.added_at, workspace_item.rowid
+        """,
+        [workspace_id],
+    )
+    return [InputItem(**row) for row in rows]
+
+
+def list_items_not_in_workspace(db, user_id: int, workspace_id: str) -> list:
+    """Return the user's input items that are not part of a workspace"""
+    rows = db.q(
+        """
+        SELECT * FROM input_item
+        WHERE user_id = ?
+          AND id NOT IN (SELECT input_item_id FROM workspace_item WHERE workspace_id = ?)
+        """,
+        [user_id, workspace_id],
+    )
+    return [InputItem(**row) for row in rows]
+
+
+def get_input_items(db, item_ids: list) -> list:
+    """Fetch input items by id, in the order the ids are given"""
+    if not item_ids:
+        return []
+    placeholders = ", ".join("?" for _ in item_ids)
+    rows = {row["id"]: row for row in db.q(f"SELECT * FROM input_item WHERE id IN ({placeholders})", list(item_ids))}
+    return [InputItem(**rows[item_id]) for item_id in item_ids if item_id in rows]
+
+
+def get_input_item(db, item_id: str) -> InputItem:
+    """Fetch one input item; raises NotFoundError like `input_items[item_id]`"""
+    return InputItem(**db.t.input_item[item_id])
+
+
+def has_items_not_in_workspace(db, user_id: int, workspace_id: str) -> bool:
+    """Check whether the user has any input item that is not part of a workspace"""
+    return bool(db.q(
+        """
+        SELECT 1 FROM input_item
+        WHERE user_id = ?
+          AND id NOT IN (SELECT input_item_id FROM workspace_item WHERE workspace_id = ?)
+        LIMIT 1
+        """,
+        [user_id, workspace_id],
+    ))
+
+
+def count_workspace_items(db, workspace_id: str) -> int:
+    """Return the number of input items in a workspace"""
+    return db.q(
+        "SELECT COUNT(*) AS n FROM workspace_item WHERE workspace_id = ?",
+        [workspace_id],
+    )[0]["n"]
+
+
+def workspace_has_item(db, workspace_id: str, item_id: str) -> bool:
+    """Check whether an input item belongs to a workspace"""
+    return bool(db.q(
+        "SELECT 1 FROM workspace_item WHERE workspace_id = ? AND input_item_id = ?",
+        [workspace_id, item_id],
+    ))
+
+
+def item_workspace_ids(db, item_id: str, user_id: int = None) -> list:
+    """Return the ids of the workspaces containing an input item"""
+    sql = """
+        SELECT workspace_item.workspace_id FROM workspace_item
+        JOIN workspace ON workspace.id = workspace_item.workspace_id
+        WHERE workspace_item.input_item_id = ?
+    """
+    params = [item_id]
+    if user_id is not None:
+        sql += " AND workspace.user_id = ?"
+        params.append(user_id)
+    sql += " ORDER BY workspace_item.added_at"
+    return [row["workspace_id"] for row in db.q(sql, params)]
+
+
+def add_workspace_item(db, workspace_id: str, item_id: str) -> bool:
+    """Link an input item to a workspace, returns False if it was already linked"""
+    with db.conn:
+        db.execute(
+            "INSERT OR IGNORE INTO workspace_item (workspace_id, input_item_id, added_at) VALUES (?, ?, ?)",
+            [workspace_id, item_id, get_current_timestamp()],
+        )
+        return db.conn.changes() > 0
+
+
+def remove_workspace_item(db, workspace_id: str, item_id: str) -> bool:
+    """Unlink an input item from a workspace, returns False if it was not linked"""
+    with db.conn:
+        db.execute(
+            "DELETE FROM workspace_item WHERE workspace_id = ? AND input_item_id = ?",
+            [workspace_id, item_id],
+        )
+        return db.conn.changes() > 0
+
+
+def remove_item_from_workspaces(db, item_id: str):
+    """Unlink an input item from every workspace (used when the item is deleted)"""
+    db.execute("DELETE FROM workspace_item WHERE input_item_id = ?", [item_id])
+
+
+def clear_workspace_items(db, workspace_id: str):
+    """Unlink every input item from a workspace (used when the workspace is deleted)"""
+    db.execute("DELETE FROM workspace_item WHERE workspace_id = ?", [workspace_id])
+
+
+def migrate_workspace_item_ids(db) -> int:
+    """Move legacy Workspace.input_item_ids JSON arrays into workspace_item rows.
+
+    Safe to run on every startup: migrated workspaces get their JSON column reset
+    to "[]", so later runs find nothing to do. Returns the number of links created.
+    """
+    rows = db.q(
+        "SELECT id, input_item_ids FROM workspace WHERE input_item_ids IS NOT NULL AND input_item_ids NOT IN ('', '[]')"
+    )
+    migrated = 0
+    with db.conn:
+        for row in rows:
+            try:
+                item_ids = json.loads(row["input_item_ids"])
+            except json.JSONDecodeError:
+                item_ids = []
+            added_at = get_current_timestamp()
+            for item_id in item_ids:
+                # Skip ids of items that were deleted while still listed in the JSON
+                db.execute(
+                    """
+                    INSERT OR IGNORE INTO workspace_item (workspace_id, input_item_id, added_at)
+                    SELECT ?, ?, ? WHERE EXISTS (SELECT 1 FROM input_item WHERE id = ?)
+                    """,
+                    [row["id"], item_id, added_at, item_id],
+                )
+                migrated += db.conn.changes()
+            db.execute("UPDATE workspace SET input_item_ids = '[]' WHERE id = ?", [row["id"]])
+    return migrated
+
+
+# Keyset pagination for the listing pages
+def ensure_listing_indexes(db):
+    """Create the (user_id, timestamp, id) indexes that keyset pages walk"""
+    db.t.input_item.create_index(["user_id", "uploaded_at", "id"], if_not_exists=True)
+    db.t.maintenance_report.create_index(["user_id", "created_at", "id"], if_not_exists=True)
+    db.t.workspace.create_index(["user_id", "created_at", "id"], if_not_exists=True)
+
+
+def encode_cursor(timestamp: str, row_id) -> str:
+    """Build the opaque cursor pointing just past a row"""
+    return f"{timestamp}|{row_id}"
+
+
+def decode_cursor(cursor: str):
+    """Split a cursor back into (timestamp, id), or None for the first page.
+
+    Raises ValueError for a cursor that isn't one encode_cursor made, so callers
+    don't serve the first page as if it came after that cursor.
+    """
+    if not cursor:
+        return None
+    timestamp, sep, row_id = cursor.partition("|")
+    if not (sep and timestamp and row_id):
+        raise ValueError(f"Malformed cursor: {cursor!r}")
+    return timestamp, row_id
+
+
+def _keyset_sql(table: str, order_col: str, after_cursor: bool) -> str:
+    sql = f"SELECT * FROM {table} WHERE user_id = ?"
+    if after_cursor:
+        sql += f" AND ({order_col}, id) < (?, ?)"
+    return sql + f" ORDER BY {order_col} DESC, id DESC LIMIT ?"
+
+
+def _keyset_page(db, table: str, order_col: str, user_id: int, limit: int, cursor: str = None):
+    """Fetch one newest-first page of a user's rows.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page. One extra
+    row is fetched to find out whether another page exists. A malformed cursor
+    raises ValueError.
+    """
+    position = decode_cursor(cursor)
+    params = [user_id, *(position or ()), limit + 1]
+    rows = db.q(_keyset_sql(table, order_col, bool(position)), params)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][order_col], rows[-1]["id"])
+    return rows, next_cursor
+
+
+def page_input_items(db, user_id: int, limit: int, cursor: str = None):
+    """Return (items, next_cursor) for a page of the user's input items, newest first"""
+    rows, next_cursor = _keyset_page(db, "input_item", "uploaded_at", user_id, limit, cursor)
+    return [InputItem(**row) for row in rows], next_cursor
+
+
+def page_reports(db, user_id: int, limit: int, cursor: str = None):
+    """Return (reports, next_cursor) for a page of the user's reports, newest first"""
+    rows, next_cursor = _keyset_page(db, "maintenance_report", "created_at", user_id, limit, cursor)
+    return [MaintenanceReport(**row) for row in rows], next_cursor
+
+
+def page_workspaces(db, user_id: int, limit: int, cursor: str = None):
+    """Return (workspaces, next_cursor) for a page of the user's workspaces, newest first"""
+    rows, next_cursor = _keyset_page(db, "workspace", "created_at", user_id, limit, cursor)
+    return [Workspace(**row) for row in rows], next_cursor
+
+
+def count_user_rows(db, table: str, user_id: int) -> int:
+    """Return how many rows of a per-user table belong to a user"""
+    return db.q(f"SELECT COUNT(*) AS n FROM {table} WHERE user_id = ?", [user_id])[0]["n"]
+
+
+def count_items_for_workspaces(db, workspace_ids: list) -> dict:
+    """Return {workspace_id: item count} for a batch of workspaces in one query"""
+    if not workspace_ids:
+        return {}
+    placeholders = ", ".join("?" for _ in workspace_ids)
+    rows = db.q(
+        f"""
+        SELECT workspace_id, COUNT(*) AS n FROM workspace_item
+        WHERE workspace_id IN ({placeholders})
+        GROUP BY workspace_id
+        """,
+        list(workspace_ids),
+    )
+    counts = {workspace_id: 0 for workspace_id in workspace_ids}
+    counts.update({row["workspace_id"]: row["n"] for row in rows})
+    return counts
+
+
+# Sidebar and login lookups
+RECENT_INPUT_ITEMS_SQL = "SELECT * FROM input_item WHERE user_id = ? ORDER BY uploaded_at DESC LIMIT ?"
+RECENT_WORKSPACES_SQL = "SELECT * FROM workspace WHERE user_id = ? ORDER BY updated_at DESC LIMIT ?"
+ACTIVE_USER_SQL = "SELECT * FROM user WHERE username = ? AND active = 1 LIMIT 1"
+USER_TAKEN_SQL = "SELECT 1 FROM user WHERE username = ? OR email = ? LIMIT 1"
+
+
+def ensure_lookup_indexes(db):
+    """Create the indexes behind the sidebar and login lookups"""
+    db.t.workspace.create_index(["user_id", "updated_at"], if_not_exists=True)
+    db.t.user.create_index(["username"], if_not_exists=True)
+    db.t.user.create_index(["email"], if_not_exists=True)
+
+
+def recent_input_items(db, user_id: int, limit: int = 3) -> list:
+    """Return a user's most recently uploaded input items, newest first"""
+    return [InputItem(**row) for row in db.q(RECENT_INPUT_ITEMS_SQL, [user_id, limit])]
+
+
+def recent_workspaces(db, user_id: int, limit: int = 3) -> list:
+    """Return a user's most recently updated workspaces"""
+    return [Workspace(**row) for row in db.q(RECENT_WORKSPACES_SQL, [user_id, limit])]
+
+
+def get_user(db, user_id: int) -> User:
+    """Fetch a user by id; raises NotFoundError like `users[user_id]`"""
+    return User(**db.t.user[user_id])
+
+
+def get_workspace(db, workspace_id: str) -> Workspace:
+    """Fetch a workspace by id; raises NotFoundError like `workspaces[workspace_id]`"""
+    return Workspace(**db.t.workspace[workspace_id])
+
+
+def find_active_user(db, username: str):
+    """Return the active user with this username, or None"""
+    rows = db.q(ACTIVE_USER_SQL, [username])
+    return User(**rows[0]) if rows else None
+
+
+def username_or_email_taken(db, username: str, email: str) -> bool:
+    """Check whether a username or email is already registered"""
+    return bool(db.q(USER_TAKEN_SQL, [username, email]))
+
+
+# Hot queries whose plans check_query_plans verifies at startup
+INDEXED_QUERIES = {
+    "recent_input_items": RECENT_INPUT_ITEMS_SQL,
+    "recent_workspaces": RECENT_WORKSPACES_SQL,
+    "active_user": ACTIVE_USER_SQL,
+    "user_taken": USER_TAKEN_SQL,
+    "recent_reports": "SELECT * FROM maintenance_report WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+    "page_input_items": _keyset_sql("input_item", "uploaded_at", True),
+    "page_reports": _keyset_sql("maintenance_report", "created_at", True),
+    "page_workspaces": _keyset_sql("workspace", "created_at", True),
+    "workspace_items": (
+        "SELECT input_item.* FROM workspace_item"
+        " JOIN input_item ON input_item.id = workspace_item.input_item_id"
+        " WHERE workspace_item.workspace_id = ?"
+    ),
+}
+
+
+def explain_query_plan(db, sql: str) -> list:
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement (parameters bound to NULL)"""
+    rows = db.execute(f"EXPLAIN QUERY PLAN {sql}", [None] * sql.count("?")).fetchall()
+    return [row[-1] for row in rows]
+
+
+def check_query_plans(db, queries: dict = None):
+    """Assert that every hot query is answered from an index.
+
+    Raises RuntimeError naming any query whose plan contains a full table scan,
+    so a dropped or mistyped index fails loudly at startup instead of slowly.
+    """
+    failures = {}
+    for name, sql in (queries or INDEXED_QUERIES).items():
+        scans = [
+            detail for detail in explain_query_plan(db, sql)
+            if detail.startswith("SCAN ") and " USING " not in detail
+        ]
+        if scans:
+            failures[name] = scans
+    if failures:
+        raise RuntimeError(f"Queries without index support: {failures}")
@@ -0,0 +1,165 @@
+import argparse
+import re
+from html import escape
+
+# FTS5 index -> (content table, indexed columns). External-content tables: the
+# index stores only tokens and reads column text back from the content table.
+SEARCH_INDEXES = {
+    "input_item_fts": ("input_item", ["original_filename", "transcription", "extracted_data"]),
+    "maintenance_report_fts": (
+        "maintenance_report",
+        ["title", "description", "equipment_id", "part_numbers", "defect_codes", "corrective_action"],
+    ),
+}
+# Keep hyphenated part numbers and defect codes ("P-100", "DC_12") as single tokens
+SEARCH_TOKENIZER = "unicode61 remove_diacritics 2 tokenchars '-_'"
+# bm25 column weights, in SEARCH_INDEXES column order
+SEARCH_WEIGHTS = {
+    "input_item_fts": [2.0, 1.0, 1.5],
+    "maintenance_report_fts": [3.0, 1.0, 2.0, 2.0, 2.0, 1.0],
+}
+SNIPPET_START, SNIPPET_END = "\x02", "\x03"
+SEARCH_TERM_RE = re.compile(r"[\w\-]+")
+
+
+def _trigger_names(index: str) -> list:
+    return [f"{index}_insert", f"{index}_delete", f"{index}_update"]
+
+
+def install_search_index(db) -> bool:
+    """Create the FTS5 indexes and the triggers that keep them in step with their tables.
+
+    Returns True if any trigger was missing; the index then needs a rebuild to
+    pick up rows written before the triggers existed (or to realign rowids after
+    the content table was transformed).
+    """
+    existing = {t.name for t in db.triggers}
+    missing = False
+    for index, (table, columns) in SEARCH_INDEXES.items():
+        if all(name in existing for name in _trigger_names(index)):
+            continue
+        missing = True
+        cols = ", ".join(columns)
+        new_values = ", ".join(f"NEW.{c}" for c in columns)
+        old_values = ", ".join(f"OLD.{c}" for c in columns)
+        db.executescript(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+                {cols}, content='{table}', content_rowid='rowid',
+                tokenize="{SEARCH_TOKENIZER}", prefix='2 3'
+            );
+            CREATE TRIGGER IF NOT EXISTS {index}_insert AFTER INSERT ON {table} BEGIN
+                INSERT INTO {index}(rowid, {cols}) VALUES (NEW.rowid, {new_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {index}_delete AFTER DELETE ON {table} BEGIN
+                INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', OLD.rowid, {old_values});
+            END;
+            CREATE TRIGGER IF NOT EXISTS {index}_update AFTER UPDATE OF {cols} ON {table} BEGIN
+                INSERT INTO {index}({index}, rowid, {cols}) VALUES ('delete', OLD.rowid, {old_values});
+                INSERT INTO {index}(rowid, {cols}) VALUES (NEW.rowid, {new_values});
+            END;
+        """)
+    return missing
+
+
+def search_index_in_sync(db) -> bool:
+    """Check that every index still lines up with its content table's rowids.
+
+    The content tables have TEXT primary keys, so their rowids are implicit and
+    VACUUM may renumber them (closing gaps left by deletes). The triggers keep
+    row count and highest rowid equal on both sides, and renumbering lowers the
+    content table's highest rowid, so a mismatch means the index needs a rebuild.
+    """
+    for index, (table, _) in SEARCH_INDEXES.items():
+        indexed = db.q(f"SELECT COUNT(*) AS n, MAX(id) AS top FROM {index}_docsize")[0]
+        content = db.q(f"SELECT COUNT(*) AS n, MAX(rowid) AS top FROM {table}")[0]
+        if indexed != content:
+            return False
+    return True
+
+
+def vacuum_database(db):
+    """VACUUM, then rebuild the search indexes against the possibly renumbered rowids"""
+    db.execute("VACUUM")
+    rebuild_search_index(db)
+
+
+def rebuild_search_index(db):
+    """Re-tokenize every row of the content tables into the FTS indexes"""
+    with db.conn:
+        for index in SEARCH_INDEXES:
+            db.execute(f"INSERT INTO {index}({index}) VALUES ('rebuild')")
+
+
+def fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every term must match, as a prefix"""
+    terms = SEARCH_TERM_RE.findall(text or "")
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def highlight_snippet(snippet: str) -> str:
+    """HTML-escape an FTS snippet and turn its match markers into <mark> tags"""
+    return escape(snippet or "").replace(SNIPPET_START, "<mark>").replace(SNIPPET_END, "</mark>")
+
+
+def _bm25(index: str) -> str:
+    return f"bm25({index}, {', '.join(str(w) for w in SEARCH_WEIGHTS[index])})"
+
+
+def search_input_items(db, user_id: int, query: str, limit: int = 20) -> list:
+    """Best-ranked input items of a user matching the query, with highlighted snippets"""
+    match = fts_query(query)
+    if not match:
+        return []
+    rows = db.q(
+        f"""
+        SELECT i.id, i.original_filename, i.file_type, i.uploaded_at,
+               snippet(input_item_fts, -1, ?, ?, '…', 12) AS snippet,
+               {_bm25("input_item_fts")} AS score
+        FROM input_item_fts JOIN input_item i ON i.rowid = input_item_fts.rowid
+        WHERE input_item_fts MATCH ? AND i.user_id = ?
+        ORDER BY score LIMIT ?
+        """,
+        [SNIPPET_START, SNIPPET_END, match, user_id, limit],
+    )
+    for row in rows:
+        row["snippet"] = highlight_snippet(row["snippet"])
+    return rows
+
+
+def search_reports(db, user_id: int, query: str, limit: int = 20) -> list:
+    """Best-ranked maintenance reports of a user matching the query, with highlighted snippets"""
+    match = fts_query(query)
+    if not match:
+        return []
+    rows = db.q(
+        f"""
+        SELECT r.id, r.title, r.status, r.priority, r.created_at,
+               snippet(maintenance_report_fts, -1, ?, ?, '…', 12) AS snippet,
+               {_bm25("maintenance_report_fts")} AS score
+        FROM maintenance_report_fts JOIN maintenance_report r ON r.rowid = maintenance_report_fts.rowid
+        WHERE maintenance_report_fts MATCH ? AND r.user_id = ?
+        ORDER BY score LIMIT ?
+        """,
+        [SNIPPET_START, SNIPPET_END, match, user_id, limit],
+    )
+    for row in rows:
+        row["snippet"] = highlight_snippet(row["snippet"])
+    return rows
+
+
+if __name__ == "__main__":
+    from database import connect_writer
+
+    parser = argparse.ArgumentParser(description="Maintain the full-text search indexes")
+    parser.add_argument("command", choices=["rebuild", "vacuum"])
+    parser.add_argument("--db", default="data/frontline.db")
+    args = parser.parse_args()
+
+    db = connect_writer(args.db)
+    install_search_index(db)
+    if args.command == "vacuum":
+        vacuum_database(db)
+        print(f"Vacuumed {args.db} and rebuilt {', '.join(SEARCH_INDEXES)}")
+    else:
+        rebuild_search_index(db)
+        print(f"Rebuilt {', '.join(SEARCH_INDEXES)}")
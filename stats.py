@@ -0,0 +1,156 @@
+import argparse
+from models import MaintenanceReport
+
+REPORT_STATUSES = ["open", "in_progress", "completed", "closed"]
+REPORT_PRIORITIES = ["low", "medium", "high", "critical"]
+
+# user_stats column for each counted status/priority value
+STATUS_COLUMNS = {status: f"{status}_reports" for status in REPORT_STATUSES}
+PRIORITY_COLUMNS = {priority: f"{priority}_priority" for priority in REPORT_PRIORITIES}
+STATS_COLUMNS = ["total_reports", *STATUS_COLUMNS.values(), *PRIORITY_COLUMNS.values()]
+USER_STATS_TRIGGERS = ["user_stats_report_insert", "user_stats_report_delete", "user_stats_report_update"]
+
+
+def ensure_stats_indexes(db):
+    """Create the indexes backing the dashboard and sidebar queries"""
+    reports = db.t.maintenance_report
+    reports.create_index(["user_id", "created_at"], if_not_exists=True)
+    reports.create_index(["user_id", "status", "priority"], if_not_exists=True)
+
+
+def report_counts(db, user_id: int) -> dict:
+    """Count a user's reports by status and priority with a single GROUP BY query"""
+    counts = {
+        "total": 0,
+        "status": {status: 0 for status in REPORT_STATUSES},
+        "priority": {priority: 0 for priority in REPORT_PRIORITIES},
+    }
+    rows = db.q(
+        """
+        SELECT status, priority, COUNT(*) AS n FROM maintenance_report
+        WHERE user_id = ?
+        GROUP BY status, priority
+        """,
+        [user_id],
+    )
+    for row in rows:
+        counts["total"] += row["n"]
+        counts["status"][row["status"]] = counts["status"].get(row["status"], 0) + row["n"]
+        counts["priority"][row["priority"]] = counts["priority"].get(row["priority"], 0) + row["n"]
+    return counts
+
+
+def recent_reports(db, user_id: int, limit: int = 5) -> list:
+    """Return a user's most recently created reports, newest first"""
+    rows = db.q(
+        "SELECT * FROM maintenance_report WHERE user_id = ? ORDER BY created_at DESC LIMIT ?",
+        [user_id, limit],
+    )
+    return [MaintenanceReport(**row) for row in rows]
+
+
+# Materialized per-user counters (user_stats), kept in sync by triggers
+def _stats_delta_sql(row: str, sign: str) -> str:
+    """SET clause adding (sign="+") or removing (sign="-") one report row from the counters"""
+    deltas = [f"total_reports = total_reports {sign} 1"]
+    deltas += [f"{column} = {column} {sign} ({row}.status = '{status}')" for status, column in STATUS_COLUMNS.items()]
+    deltas += [f"{column} = {column} {sign} ({row}.priority = '{priority}')" for priority, column in PRIORITY_COLUMNS.items()]
+    return ", ".join(deltas)
+
+
+def _ensure_stats_row_sql(row: str) -> str:
+    columns = ", ".join(STATS_COLUMNS)
+    zeros = ", ".join("0" for _ in STATS_COLUMNS)
+    return f"INSERT OR IGNORE INTO user_stats (user_id, {columns}) VALUES ({row}.user_id, {zeros});"
+
+
+def install_user_stats_triggers(db) -> bool:
+    """Create the triggers that keep user_stats in step with maintenance_report.
+
+    The counters are updated inside the same transaction as the report insert,
+    delete or status/priority edit, so they can never drift from a committed
+    write. Returns True if the triggers were missing (the table then needs a
+    rebuild to pick up reports written before they existed).
+    """
+    existing = {t.name for t in db.triggers}
+    if all(name in existing for name in USER_STATS_TRIGGERS):
+        return False
+    db.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS user_stats_report_insert AFTER INSERT ON maintenance_report BEGIN
+            {_ensure_stats_row_sql("NEW")}
+            UPDATE user_stats SET {_stats_delta_sql("NEW", "+")} WHERE user_id = NEW.user_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS user_stats_report_delete AFTER DELETE ON maintenance_report BEGIN
+            UPDATE user_stats SET {_stats_delta_sql("OLD", "-")} WHERE user_id = OLD.user_id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS user_stats_report_update AFTER UPDATE OF status, priority, user_id ON maintenance_report BEGIN
+            UPDATE user_stats SET {_stats_delta_sql("OLD", "-")} WHERE user_id = OLD.user_id;
+            {_ensure_stats_row_sql("NEW")}
+            UPDATE user_stats SET {_stats_delta_sql("NEW", "+")} WHERE user_id = NEW.user_id;
+        END;
+    """)
+    return True
+
+
+def _aggregate_stats_sql(where: str = "") -> str:
+    sums = [f"SUM(status = '{status}')" for status in STATUS_COLUMNS]
+    sums += [f"SUM(priority = '{priority}')" for priority in PRIORITY_COLUMNS]
+    return f"""
+        SELECT user_id, COUNT(*), {", ".join(sums)} FROM maintenance_report
+        {where} GROUP BY user_id
+    """
+
+
+def rebuild_user_stats(db, user_id: int = None) -> int:
+    """Recompute user_stats from maintenance_report, for one user or everyone"""
+    where, params = ("WHERE user_id = ?", [user_id]) if user_id is not None else ("", [])
+    with db.conn:
+        db.execute(f"DELETE FROM user_stats {where}", params)
+        db.execute(
+            f"INSERT INTO user_stats (user_id, {', '.join(STATS_COLUMNS)}) {_aggregate_stats_sql(where)}",
+            params,
+        )
+    return db.q(f"SELECT COUNT(*) AS n FROM user_stats {where}", params)[0]["n"]
+
+
+def check_user_stats(db) -> list:
+    """Return the ids of users whose stored counters differ from a fresh aggregate"""
+    fresh = {row[0]: list(row[1:]) for row in db.execute(_aggregate_stats_sql())}
+    stored = {
+        row[0]: list(row[1:])
+        for row in db.execute(f"SELECT user_id, {', '.join(STATS_COLUMNS)} FROM user_stats")
+    }
+    zeros = [0] * len(STATS_COLUMNS)
+    return sorted(
+        user_id for user_id in fresh.keys() | stored.keys()
+        if fresh.get(user_id, zeros) != stored.get(user_id, zeros)
+    )
+
+
+def get_user_stats(db, user_id: int) -> dict:
+    """Read a user's report counters from user_stats (same shape as report_counts)"""
+    rows = db.q(f"SELECT {', '.join(STATS_COLUMNS)} FROM user_stats WHERE user_id = ?", [user_id])
+    row = rows[0] if rows else {column: 0 for column in STATS_COLUMNS}
+    return {
+        "total": row["total_reports"],
+        "status": {status: row[column] for status, column in STATUS_COLUMNS.items()},
+        "priority": {priority: row[column] for priority, column in PRIORITY_COLUMNS.items()},
+    }
+
+
+if __name__ == "__main__":
+    from database import connect_writer
+
+    parser = argparse.ArgumentParser(description="Maintain the materialized user_stats table")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user-id", type=int, default=None, help="Only rebuild this user's counters")
+    parser.add_argument("--db", default="data/frontline.db")
+    args = parser.parse_args()
+
+    db = connect_writer(args.db)
+    if args.command == "rebuild":
+        print(f"Rebuilt stats for {rebuild_user_stats(db, args.user_id)} user(s)")
+    else:
+        mismatched = check_user_stats(db)
+        print(f"Mismatched users: {mismatched}" if mismatched else "user_stats is consistent")
+        raise SystemExit(1 if mismatched else 0)
@@ -1,4 +1,5 @@
 import hashlib
+import aiofiles
 import uuid
 from datetime import datetime
 
@@ -13,4 +14,27 @@ def verify_password(password: str, password_hash: str) -> bool:
     return hash_password(password) == password_hash
 
 def get_current_timestamp():
-    return datetime.now().isoformat()
\ No newline at end of file
+    return datetime.now().isoformat()
+
+def file_sha256(file_path, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+async def iter_upload_chunks(upload, chunk_size: int = 1024 * 1024):
+    """Yield an UploadFile's content in fixed-size chunks"""
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
+async def stream_to_file(chunks, file_path, mode: str = "wb"):
+    """Write an async stream of byte chunks to disk, returning (size, sha256 hex)"""
+    digest = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(file_path, mode) as f:
+        async for chunk in chunks:
+            await f.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+    return size, digest.hexdigest()